@@ -3,26 +3,103 @@
 PyUTAU - 基于Python的UTAU乐声合成插件
 """
 
-from .gui_component import PyUTAUComponent
-from .synthesis_engine import SynthesisEngine
-from .voice_library import VoiceLibrary
-from .note import Note, Track
-from .project import Project, ProjectSettings
-from .ust_parser import USTParser
-from .library_adapter import LibraryAdapter  # 新增
-from .library_detector import LibraryDetector  # 新增
-
-__version__ = "0.0.4"  
-__all__ = [
-    'PyUTAUComponent', 
-    'SynthesisEngine', 
-    'VoiceLibrary', 
-    'Note', 
-    'Track', 
+import importlib
+import sys
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # 仅供类型检查器使用；运行时 GUI 依赖按需加载
+    from .gui_component import PyUTAUComponent
+
+# 未安装分发包（直接加入 sys.path 使用）时的版本号
+_FALLBACK_VERSION = "0.0.4"
+__all__ = (
+    'PyUTAUComponent',
+    'SynthesisEngine',
+    'VoiceLibrary',
+    'Note',
+    'Track',
     'Project',
     'ProjectSettings',
     'USTParser',
-    'LibraryAdapter',  
-    'LibraryDetector'  
-]
+    'LibraryAdapter',
+    'LibraryDetector',
+    'warm',
+)
+
+# 延迟导入表：公开名称 -> (子模块, 属性名)，首次访问时才加载子模块
+_LAZY = {
+    'PyUTAUComponent': ('.gui_component', 'PyUTAUComponent'),
+    'SynthesisEngine': ('.synthesis_engine', 'SynthesisEngine'),
+    'VoiceLibrary': ('.voice_library', 'VoiceLibrary'),
+    'Note': ('.note', 'Note'),
+    'Track': ('.note', 'Track'),
+    'Project': ('.project', 'Project'),
+    'ProjectSettings': ('.project', 'ProjectSettings'),
+    'USTParser': ('.ust_parser', 'USTParser'),
+    'LibraryAdapter': ('.library_adapter', 'LibraryAdapter'),
+    'LibraryDetector': ('.library_detector', 'LibraryDetector'),
+}
+_LAZY = {sys.intern(k): v for k, v in _LAZY.items()}
+_ALL_SET = frozenset(__all__) | frozenset(_LAZY) | {'__version__'}
+
+# warm() 预导入的模块（numpy/scipy/librosa 导入较慢，命中测试内核首次导入时需编译）
+_WARM_MODULES = ('.synthesis_engine', '.voice_library', '.library_adapter', '._hit_kernels')
+_warm_thread = None
+
+
+def __getattr__(name):
+    """按需导入子模块（PEP 562），结果缓存到模块字典中"""
+    if name not in _ALL_SET:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    if name == '__version__':
+        from importlib.metadata import version, PackageNotFoundError
+        try:
+            v = version('embedded_utau')
+        except PackageNotFoundError:
+            v = _FALLBACK_VERSION
+        globals()['__version__'] = v
+        return v
+
+    module_name, attr = _LAZY[name]
+    try:
+        module = importlib.import_module(module_name, __name__)
+    except ImportError as e:
+        # 只有缺少 tkinter 本身时才提示图形界面支持，其他依赖缺失原样抛出
+        if module_name == '.gui_component' and e.name in ('tkinter', '_tkinter'):
+            raise ImportError(
+                "PyUTAUComponent 需要图形界面支持 (tkinter)，"
+                "无界面环境请直接使用 SynthesisEngine / USTParser"
+            ) from e
+        raise
+    obj = getattr(module, attr)
+    globals()[name] = obj
+    return obj
+
+
+def __dir__():
+    return sorted(set(globals()) | _ALL_SET)
+
+
+def _warm():
+    """依次预导入 _WARM_MODULES"""
+    try:
+        for module_name in _WARM_MODULES:
+            importlib.import_module(module_name, __name__)
+    except Exception:
+        pass
+
 
+def warm() -> threading.Thread:
+    """在后台线程中预导入合成相关模块，隐藏首次合成时的导入延迟
+    
+    导入包本身不会触发预热，由界面等需要的调用方显式调用；重复调用只启动一个线程。
+    与预热线程同时导入同一模块是安全的（导入系统按模块加锁）。
+    """
+    global _warm_thread
+    if _warm_thread is None:
+        _warm_thread = threading.Thread(target=_warm, name='embedded_utau-warm', daemon=True)
+        _warm_thread.start()
+    return _warm_thread
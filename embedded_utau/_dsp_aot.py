@@ -0,0 +1,41 @@
+# embedded_utau/_dsp_aot.py
+"""DSP 内核预编译脚本 - 用 numba.pycc 生成 _dsp_native 扩展模块
+
+运行 python -m embedded_utau._dsp_aot 后，_dsp_kernels 会优先加载生成的扩展，
+启动时不再需要 JIT 编译，运行时也不再依赖 numba。
+"""
+import os
+import sys
+
+# 导出的内核及其参数签名（{t} 替换为 f4 / f8）
+_EXPORTS = {
+    'fir3_inplace': 'void({t}[:])',
+    'cos_envelope_inplace': 'void({t}[:], i8, i8)',
+    'soft_knee_compress': 'void({t}[:], {t}[:], f8, f8, f8)',
+    'limit_inplace': 'void({t}[:], f8)',
+}
+
+
+def build(output_dir=None):
+    """编译 float32 / float64 两套内核到 output_dir（默认包目录），返回输出目录"""
+    from numba.pycc import CC
+
+    try:
+        from embedded_utau import _dsp_kernels
+    except ImportError:
+        from . import _dsp_kernels
+
+    cc = CC('_dsp_native')
+    cc.output_dir = output_dir or os.path.dirname(os.path.abspath(__file__))
+    for name, signature in _EXPORTS.items():
+        func = _dsp_kernels._KERNELS[name]
+        func = getattr(func, 'py_func', func)
+        for t in ('f4', 'f8'):
+            cc.export(f'{name}_{t}', signature.format(t=t))(func)
+    cc.compile()
+    return cc.output_dir
+
+
+if __name__ == '__main__':
+    out = build(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"✓ DSP 内核已编译到: {out}")
@@ -0,0 +1,112 @@
+# embedded_utau/_dsp_kernels.py
+"""音频 DSP 内核 - 优先使用预编译扩展，其次 numba JIT，融合逐样本循环避免临时数组"""
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """numba 不可用时的空装饰器"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def fir3_inplace(x):
+    """原地三点平滑 [0.25, 0.5, 0.25]（首尾样本不变），使用平滑前的相邻值"""
+    if x.size < 3:
+        return
+    prev = x[0]
+    for i in range(1, x.size - 1):
+        cur = x[i]
+        x[i] = 0.25 * prev + 0.5 * cur + 0.25 * x[i + 1]
+        prev = cur
+
+
+@njit(cache=True)
+def cos_envelope_inplace(x, attack_len, release_len):
+    """原地乘以升余弦淡入（前 attack_len 个样本）和淡出（后 release_len 个样本）"""
+    if attack_len > 0:
+        step = math.pi / (attack_len - 1) if attack_len > 1 else 0.0
+        for i in range(attack_len):
+            x[i] *= 0.5 - 0.5 * math.cos(step * i)
+    if release_len > 0:
+        step = math.pi / (release_len - 1) if release_len > 1 else 0.0
+        start = x.size - release_len
+        for i in range(release_len):
+            x[start + i] *= 0.5 + 0.5 * math.cos(step * i)
+
+
+@njit(cache=True)
+def soft_knee_compress(x, out, threshold, ratio, knee_width):
+    """软膝压缩：膝部内从1:1线性过渡到 ratio，膝部以上完全压缩，结果写入 out"""
+    knee_start = threshold - knee_width / 2
+    for i in range(x.size):
+        value = x[i]
+        magnitude = abs(value)
+        excess = magnitude - knee_start
+        if excess > 0:
+            knee_t = min(excess / knee_width, 1.0)
+            magnitude -= excess * (1 - 1 / (1 + (ratio - 1) * knee_t))
+            out[i] = magnitude if value > 0 else -magnitude
+        else:
+            out[i] = value
+
+
+@njit(cache=True)
+def limit_inplace(x, threshold):
+    """原地峰值限制：超过阈值的样本缩放到阈值"""
+    for i in range(x.size):
+        magnitude = abs(x[i])
+        if magnitude > threshold:
+            x[i] *= threshold / magnitude
+
+
+# 内核原函数（numba 调度器），供 _dsp_aot 预编译使用
+_KERNELS = {
+    'fir3_inplace': fir3_inplace,
+    'cos_envelope_inplace': cos_envelope_inplace,
+    'soft_knee_compress': soft_knee_compress,
+    'limit_inplace': limit_inplace,
+}
+
+# 预编译扩展（python -m embedded_utau._dsp_aot 生成），存在时无需 numba 和 JIT 编译
+try:
+    from . import _dsp_native
+except ImportError:
+    _dsp_native = None
+
+KERNELS_AVAILABLE = NUMBA_AVAILABLE or _dsp_native is not None
+
+
+def _native_kernel(name):
+    """按数组 dtype 分派到预编译扩展中的 float32 / float64 版本"""
+    f4 = getattr(_dsp_native, name + '_f4')
+    f8 = getattr(_dsp_native, name + '_f8')
+
+    def kernel(x, *args):
+        return (f4 if x.dtype == np.float32 else f8)(x, *args)
+
+    kernel.__name__ = name
+    return kernel
+
+
+if _dsp_native is not None:
+    fir3_inplace = _native_kernel('fir3_inplace')
+    cos_envelope_inplace = _native_kernel('cos_envelope_inplace')
+    soft_knee_compress = _native_kernel('soft_knee_compress')
+    limit_inplace = _native_kernel('limit_inplace')
+elif NUMBA_AVAILABLE:
+    # 预热编译，避免首个音符合成时卡顿
+    for _dtype in (np.float32, np.float64):
+        _warm = np.zeros(4, dtype=_dtype)
+        fir3_inplace(_warm)
+        cos_envelope_inplace(_warm, 1, 1)
+        soft_knee_compress(_warm, _warm, 0.3, 2.0, 0.1)
+        limit_inplace(_warm, 0.9)
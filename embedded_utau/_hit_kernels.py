@@ -0,0 +1,34 @@
+# embedded_utau/_hit_kernels.py
+"""音符命中测试内核 - 安装 numba 时编译为本地代码"""
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """numba 不可用时的空装饰器"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def hit_test(starts, ends, pitches, order, lo, hi, time, pitch, tolerance):
+    """在排序后数组的 [lo, hi) 范围内查找命中音符，返回原始索引，未命中返回 -1"""
+    best = -1
+    for i in range(lo, hi):
+        if starts[i] <= time and abs(pitches[i] - pitch) <= 1 and ends[i] + tolerance >= time:
+            idx = order[i]
+            if best < 0 or idx < best:
+                best = idx
+    return best
+
+
+if NUMBA_AVAILABLE:
+    # 预热编译，避免首次点击时卡顿
+    _empty_f = np.zeros(0, dtype=np.float64)
+    _empty_i = np.zeros(0, dtype=np.int64)
+    hit_test(_empty_f, _empty_f, _empty_i, _empty_i, 0, 0, 0.0, 0, 0.0)
@@ -4,7 +4,22 @@ from tkinter import ttk, filedialog, messagebox
 import zipfile
 import tempfile
 import os
+import copy
+import hashlib
+import platform
+import posixpath
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import astuple
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 import numpy as np
 
 # 灵活的导入方式
@@ -15,6 +30,8 @@ try:
     from embedded_utau.note import Note, Track
     from embedded_utau.project import Project, ProjectSettings
     from embedded_utau.ust_parser import USTParser
+    from embedded_utau.utils import user_cache_dir
+    from embedded_utau import warm
 except ImportError:
     # 后备：相对导入
     try:
@@ -23,16 +40,214 @@ except ImportError:
         from .note import Note, Track
         from .project import Project, ProjectSettings
         from .ust_parser import USTParser
+        from .utils import user_cache_dir
+        from . import warm
     except ImportError as e:
         print(f"导入失败: {e}")
         raise
 
+
+# 后备播放使用的系统播放器
+_SYSTEM = platform.system()
+_SYSTEM_PLAYERS = {'Darwin': 'afplay', 'Linux': 'aplay'}
+
+# sounddevice 模块缓存：None 表示尚未导入，False 表示不可用
+_sd = None
+
+
+def _get_sd():
+    """导入并缓存 sounddevice，不可用时返回 None"""
+    global _sd
+    if _sd is None:
+        try:
+            import sounddevice
+            _sd = sounddevice
+        except (ImportError, OSError):
+            # 未安装或缺少 PortAudio 库
+            _sd = False
+    return _sd or None
+
+
+# 持久化音源库缓存的大小上限，超出后按最近使用时间淘汰
+VOICE_CACHE_MAX_BYTES = 5 * 1024 ** 3
+
+
+def _write_wav_pcm16(path, audio_int16, sample_rate):
+    """直接写出单声道16位 WAV 文件（44 字节 RIFF 头 + 原始样本）"""
+    data = np.ascontiguousarray(audio_int16, dtype='<i2')
+    data_len = data.nbytes
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_len, b'WAVE',
+        b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b'data', data_len
+    )
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(memoryview(data).cast('B'))
+
+
+def _zip_fingerprint(zip_path) -> str:
+    """根据文件大小和中央目录（各成员的名称、CRC、大小）计算 ZIP 指纹
+    
+    只读取中央目录，不读成员数据；任一成员内容变化都会改变其 CRC
+    """
+    h = hashlib.sha256(str(os.path.getsize(zip_path)).encode())
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        for info in zf.infolist():
+            h.update(info.filename.encode('utf-8', 'surrogateescape'))
+            h.update(struct.pack('<IQQ', info.CRC, info.file_size, info.compress_size))
+    return h.hexdigest()
+
+
+def _voice_cache_root() -> Path:
+    """用户级音源库缓存目录"""
+    return user_cache_dir() / 'voices'
+
+
+def _extract_to_voice_cache(zip_path, key, progress=None) -> str:
+    """将 ZIP 解压到用户缓存目录，已解压过的直接复用（跨进程有效）
+    
+    目录名只取指纹前 16 位，完整指纹写在完成标记 .ok 中，复用前核对
+    """
+    cache_root = _voice_cache_root()
+    target = cache_root / key[:16]
+    if _read_ok_marker(target) == key:
+        os.utime(target)  # 更新最近使用时间，供淘汰使用
+        return str(target)
+    
+    # 先解压到临时目录，完成后整体改名，避免留下不完整的缓存
+    cache_root.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f"{key[:16]}.tmp-", dir=cache_root))
+    try:
+        _extract_zip_parallel(zip_path, staging, progress)
+        (staging / '.ok').write_text(key, encoding='ascii')
+        shutil.rmtree(target, ignore_errors=True)
+        try:
+            os.replace(staging, target)
+        except OSError:
+            # 其他进程已抢先完成同一解压
+            if _read_ok_marker(target) != key:
+                raise
+            shutil.rmtree(staging, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    
+    _evict_voice_cache(cache_root, VOICE_CACHE_MAX_BYTES, keep=target)
+    return str(target)
+
+
+def _read_ok_marker(target: Path) -> Optional[str]:
+    """读取缓存目录完成标记中记录的 ZIP 指纹，未完成或不可读时返回 None"""
+    try:
+        return (target / '.ok').read_text(encoding='ascii').strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _is_persistent_dir(library_dir) -> bool:
+    """是否位于跨会话保留的用户缓存目录中"""
+    return Path(library_dir).parent == _voice_cache_root()
+
+
+def _remove_session_dirs(temp_dirs: dict):
+    """删除会话临时解压目录（持久缓存目录保留）"""
+    for temp_dir in temp_dirs.values():
+        if not _is_persistent_dir(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    temp_dirs.clear()
+
+
+def _release_when_idle(engine_lock, finalizer):
+    """等待合成线程用完引擎后执行清理（在同一线程中依次完成）"""
+    with engine_lock:
+        finalizer()
+
+
+def _evict_voice_cache(cache_root: Path, max_bytes: int, keep: Path):
+    """缓存总大小超过上限时，删除最久未使用的音源库"""
+    entries = []
+    for entry in os.scandir(cache_root):
+        if not entry.is_dir() or '.tmp-' in entry.name:
+            continue
+        size = sum(f.stat().st_size for f in Path(entry.path).rglob('*') if f.is_file())
+        entries.append((entry.stat().st_mtime, size, Path(entry.path)))
+    
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def _extract_zip_parallel(zip_path, target_dir, progress=None, max_workers=None):
+    """多线程解压 ZIP，每个工作线程使用独立的 ZipFile 句柄"""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = zip_ref.infolist()
+        
+        # 先在当前线程创建全部目录，避免工作线程并发创建同一目录
+        parent_dirs = {posixpath.dirname(m.filename) for m in members if not m.is_dir()}
+        for member in members:
+            if member.is_dir():
+                zip_ref.extract(member, target_dir)
+        for parent in sorted(parent_dirs):
+            if parent:
+                zip_ref.extract(zipfile.ZipInfo(parent + '/'), target_dir)
+    
+    files = [m for m in members if not m.is_dir()]
+    total = len(files)
+    if total == 0:
+        return
+    
+    workers = max(1, min(max_workers or os.cpu_count() or 1, total))
+    lock = threading.Lock()
+    done = [0]
+    
+    def extract_chunk(chunk):
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            for member in chunk:
+                zip_ref.extract(member, target_dir)
+                if progress:
+                    with lock:
+                        done[0] += 1
+                        progress(done[0], total)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() 触发迭代以便抛出工作线程中的异常
+        list(executor.map(extract_chunk, [files[i::workers] for i in range(workers)]))
+
+
+def _project_fingerprint(project) -> bytes:
+    """计算影响合成结果的项目内容指纹"""
+    canonical = (
+        astuple(project.settings),
+        tuple(
+            (t.voice_library_path, t.muted, t.solo, t.volume, t.pan,
+             tuple((n.lyric, n.pitch, n.start_time, n.duration, n.velocity, n.flags)
+                   for n in t.notes))
+            for t in project.tracks
+        ),
+    )
+    return hashlib.blake2b(repr(canonical).encode('utf-8'), digest_size=16).digest()
+
+
+@lru_cache(maxsize=32)
+def _voice_library_name(library_dir: str) -> str:
+    """获取已解压音源库的名称（按目录缓存，避免重复扫描）"""
+    return VoiceLibrary(Path(library_dir)).get_library_name()
+
 class PyUTAUComponent(ttk.Frame):
     """UTAU 组件"""
     
     def __init__(self, parent, **kwargs):
         super().__init__(parent, **kwargs)
         self.parent = parent
+        # 在后台预导入合成模块并编译命中测试内核，首次点击和合成时无需等待
+        warm()
         self.engine = SynthesisEngine()
         self.project = Project("未命名项目", ProjectSettings(total_duration=120.0))
         
@@ -43,9 +258,44 @@ class PyUTAUComponent(ttk.Frame):
         self.drag_start_y = 0
         self.drag_type = None
         self.current_zoom = 1.0  # 缩放级别
+        self._pps = 50.0  # 每秒像素数，随缩放更新
+        self._inv_pps = 1 / self._pps
+        
+        # UST 解析器（复用同一实例）
+        self._ust_parser = USTParser()
         
         # 临时文件管理
-        self.temp_dirs = {}  # 音源库路径 -> 临时目录
+        self.temp_dirs = {}  # ZIP 指纹 -> 解压目录（用户缓存目录或会话临时目录）
+        # 组件被回收或解释器退出时自动清理（不持有组件本身的引用）
+        self._temp_dirs_finalizer = weakref.finalize(self, _remove_session_dirs, self.temp_dirs)
+        
+        # 画布音符项缓存：(音轨索引, 音符索引) -> [矩形id, 文本id或None, 填充色, 歌词]
+        self._note_items = {}
+        # 音轨列表行缓存：树形视图 iid -> 最近写入的行数据
+        self._tree_rows = {}
+        self._redraw_pending = False  # 是否已安排空闲时重绘
+        self._keyboard_img = None  # 缓存的钢琴键盘图片
+        # 各图层是否需要重绘：背景 / 音轨 / 音符
+        self._dirty = {'bg': True, 'tracks': True, 'notes': True}
+        
+        # 后台合成
+        self._audio_queue = queue.Queue()  # (指纹, 音频数据, 异常)
+        self._synth_busy = False
+        # 合成线程使用引擎期间持有；主线程加载/卸载音源库前须先获取，合成进行中不修改引擎
+        self._engine_lock = threading.Lock()
+        self._cleanup_pending = False  # 合成期间推迟的解压目录清理，合成结束后在主线程执行
+        # 合成结果缓存：项目指纹 -> 音频，音频较大只保留最近几份
+        self._audio_cache = OrderedDict()
+        self._audio_cache_size = 3
+        
+        # 音频输出流：首次播放时打开，之后复用
+        self._stream = None
+        self._pcm16 = (None, None)  # (浮点音频, 量化后的16位PCM)
+        # 正在播放的数据和播放位置，由输出流回调按块读取
+        self._play_data = None
+        self._play_pos = 0
+        # 在后台预先导入音频后端，首次播放时无需等待
+        threading.Thread(target=_get_sd, daemon=True).start()
         
         self.setup_ui()
     
@@ -165,9 +415,11 @@ class PyUTAUComponent(ttk.Frame):
         piano_controls = ttk.Frame(parent)
         piano_controls.pack(fill=tk.X, pady=2)
         
-        ttk.Button(piano_controls, text="播放", command=self.play).pack(side=tk.LEFT, padx=2)
+        self._play_btn = ttk.Button(piano_controls, text="播放", command=self.play)
+        self._play_btn.pack(side=tk.LEFT, padx=2)
         ttk.Button(piano_controls, text="停止", command=self.stop).pack(side=tk.LEFT, padx=2)
-        ttk.Button(piano_controls, text="导出", command=self.export_audio).pack(side=tk.LEFT, padx=2)
+        self._export_btn = ttk.Button(piano_controls, text="导出", command=self.export_audio)
+        self._export_btn.pack(side=tk.LEFT, padx=2)
         ttk.Button(piano_controls, text="清除", command=self.clear_notes).pack(side=tk.LEFT, padx=2)
         
         # 钢琴卷帘画布区域
@@ -200,7 +452,7 @@ class PyUTAUComponent(ttk.Frame):
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         v_scrollbar.config(command=self.canvas.yview)
-        h_scrollbar.config(command=self.canvas.xview)
+        h_scrollbar.config(command=self.on_canvas_xview)
         
         # 绑定事件
         self.canvas.bind("<Button-1>", self.on_canvas_click)
@@ -209,6 +461,7 @@ class PyUTAUComponent(ttk.Frame):
         self.canvas.bind("<Button-3>", self.on_canvas_right_click)
         self.canvas.bind("<Double-Button-1>", self.on_canvas_double_click)
         self.canvas.bind("<MouseWheel>", self.on_canvas_scroll)
+        self.canvas.bind("<Configure>", self.on_canvas_configure)
     
     def setup_bottom_controls(self, parent):
         """设置底部状态栏"""
@@ -225,7 +478,6 @@ class PyUTAUComponent(ttk.Frame):
         """模式改变"""
         self.edit_mode = self.mode_var.get()
         self.status_var.set(f"就绪 - {'编写' if self.edit_mode == 'write' else '编辑'}模式")
-        self.redraw_all()
     
     def add_track(self):
         """添加音轨"""
@@ -233,15 +485,52 @@ class PyUTAUComponent(ttk.Frame):
         track = self.project.add_track(track_name)
         
         # 添加到树形视图
-        self.tracks_tree.insert("", "end", values=(
-            track.name, 
-            Path(track.voice_library_path).name if track.voice_library_path else "无",
-            "✓" if track.muted else "",
-            "✓" if track.solo else ""
-        ))
+        self._insert_track_row(track)
         
+        self.mark_dirty('tracks')
+        self.redraw_all()
         self.status_var.set(f"已添加音轨: {track_name}")
     
+    @staticmethod
+    def _track_row(track):
+        """音轨在树形视图中的一行数据"""
+        library_path = track.voice_library_path
+        return (
+            track.name,
+            os.path.basename(os.path.normpath(library_path)) if library_path else "无",
+            "✓" if track.muted else "",
+            "✓" if track.solo else ""
+        )
+    
+    def _insert_track_row(self, track):
+        """在树形视图末尾追加一行音轨"""
+        values = self._track_row(track)
+        iid = self.tracks_tree.insert("", "end", values=values)
+        self._tree_rows[iid] = values
+    
+    def _populate_tracks_tree(self, tracks):
+        """将树形视图同步为给定音轨，只更新有变化的行"""
+        rows = [self._track_row(track) for track in tracks]
+        iids = self.tracks_tree.get_children()
+        
+        # 已有行：内容变化时才更新
+        for iid, values in zip(iids, rows):
+            if self._tree_rows.get(iid) != values:
+                self.tracks_tree.item(iid, values=values)
+                self._tree_rows[iid] = values
+        
+        # 删除多余的行
+        stale = iids[len(rows):]
+        if stale:
+            self.tracks_tree.delete(*stale)
+            for iid in stale:
+                self._tree_rows.pop(iid, None)
+        
+        # 追加新增的行
+        for values in rows[len(iids):]:
+            iid = self.tracks_tree.insert("", "end", values=values)
+            self._tree_rows[iid] = values
+    
     def remove_track(self):
         """删除选中音轨"""
         selection = self.tracks_tree.selection()
@@ -250,6 +539,9 @@ class PyUTAUComponent(ttk.Frame):
                 index = self.tracks_tree.index(item)
                 self.project.remove_track(index)
                 self.tracks_tree.delete(item)
+                self._tree_rows.pop(item, None)
+            self._cleanup_orphan_temp_dirs()
+            self.mark_dirty('tracks', 'notes')
             self.redraw_all()
             self.status_var.set("已删除选中音轨")
         else:
@@ -262,6 +554,7 @@ class PyUTAUComponent(ttk.Frame):
             item = selection[0]
             index = self.tracks_tree.index(item)
             self.project.set_current_track(index)
+            self.mark_dirty('tracks')
             self.redraw_all()
     
     def on_track_double_click(self, event):
@@ -281,43 +574,99 @@ class PyUTAUComponent(ttk.Frame):
         )
         
         if zip_path:
-            try:
-                # 创建临时目录解压ZIP
-                temp_dir = tempfile.mkdtemp(prefix="pyutau_")
-                self.temp_dirs[zip_path] = temp_dir
-                
-                # 解压ZIP文件
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(temp_dir)
-                
-                # 设置音轨的音源库路径
-                track.voice_library_path = temp_dir
-                
-                # 更新树形视图
-                voice_lib = VoiceLibrary(Path(temp_dir))
-                lib_name = voice_lib.get_library_name()
-                self.tracks_tree.set(tree_item, "library", lib_name)
-                
-                self.status_var.set(f"音轨 '{track.name}' 已加载音源库: {lib_name}")
-                
-            except Exception as e:
-                messagebox.showerror("错误", f"加载音源库失败: {e}")
+            # 解压和扫描在后台线程进行，避免界面卡顿
+            state = {'done': 0, 'total': 0, 'result': None, 'error': None}
+            
+            def progress(done, total):
+                state['done'] = done
+                state['total'] = total
+            
+            def worker():
+                temp_dir = None
+                try:
+                    # 相同内容的ZIP只解压一次，并在多次启动之间复用
+                    key = _zip_fingerprint(zip_path)
+                    cached_dir = self.temp_dirs.get(key)
+                    if cached_dir is None or not os.path.isdir(cached_dir):
+                        try:
+                            cached_dir = _extract_to_voice_cache(zip_path, key, progress)
+                        except OSError:
+                            # 缓存目录不可写时退回到会话临时目录
+                            temp_dir = tempfile.mkdtemp(prefix="pyutau_")
+                            _extract_zip_parallel(zip_path, temp_dir, progress)
+                            cached_dir = temp_dir
+                    state['result'] = (key, cached_dir, _voice_library_name(cached_dir))
+                except Exception as e:
+                    if temp_dir is not None:
+                        shutil.rmtree(temp_dir, ignore_errors=True)
+                    state['error'] = e
+            
+            thread = threading.Thread(target=worker, daemon=True)
+            thread.start()
+            self.status_var.set(f"正在加载音源库: {Path(zip_path).name}")
+            self.after(50, self._poll_voice_library_load, thread, state, track, tree_item)
+    
+    def _poll_voice_library_load(self, thread, state, track, tree_item):
+        """轮询后台音源库加载进度"""
+        if thread.is_alive():
+            if state['total']:
+                self.status_var.set(f"正在解压音源库: {state['done']}/{state['total']}")
+            self.after(50, self._poll_voice_library_load, thread, state, track, tree_item)
+            return
+        
+        if state['error'] is not None:
+            messagebox.showerror("错误", f"加载音源库失败: {state['error']}")
+            return
+        
+        # 设置音轨的音源库路径（temp_dirs 只在主线程中修改）
+        key, temp_dir, lib_name = state['result']
+        if not self._temp_dirs_finalizer.alive:
+            # 加载期间组件已销毁
+            _remove_session_dirs({key: temp_dir})
+            return
+        self.temp_dirs[key] = temp_dir
+        track.voice_library_path = temp_dir
+        self._cleanup_orphan_temp_dirs()
+        
+        # 更新树形视图
+        if self.tracks_tree.exists(tree_item):
+            self.tracks_tree.set(tree_item, "library", lib_name)
+            self._tree_rows.pop(tree_item, None)  # 行内容已与缓存不同
+        
+        self.status_var.set(f"音轨 '{track.name}' 已加载音源库: {lib_name}")
     
     def zoom_in(self):
         """放大"""
-        self.current_zoom = min(4.0, self.current_zoom * 1.2)
+        self._set_zoom(min(4.0, self.current_zoom * 1.2))
+        self.mark_dirty('bg', 'notes')
         self.redraw_all()
     
     def zoom_out(self):
         """缩小"""
-        self.current_zoom = max(0.25, self.current_zoom / 1.2)
+        self._set_zoom(max(0.25, self.current_zoom / 1.2))
+        self.mark_dirty('bg', 'notes')
         self.redraw_all()
     
     def zoom_reset(self):
         """重置缩放"""
-        self.current_zoom = 1.0
+        self._set_zoom(1.0)
+        self.mark_dirty('bg', 'notes')
         self.redraw_all()
     
+    def _set_zoom(self, zoom):
+        """设置缩放级别并更新缓存的换算系数"""
+        self.current_zoom = zoom
+        self._pps = 50 * zoom
+        self._inv_pps = 1 / self._pps
+    
+    def _px2time(self, x):
+        """画布横坐标 -> 时间（秒）"""
+        return max(0.0, (x - 50) * self._inv_pps)
+    
+    def _y2pitch(self, y):
+        """画布纵坐标 -> MIDI 音高（每个音高15像素）"""
+        return 127 - int(y / 15)
+    
     def on_canvas_scroll(self, event):
         """画布滚动事件"""
         if event.delta:
@@ -328,11 +677,24 @@ class PyUTAUComponent(ttk.Frame):
         self.canvas.yview_scroll(scroll, "units")
         return "break"
     
+    def on_canvas_xview(self, *args):
+        """水平滚动 - 只绘制可见区域的音符，滚动后需要补绘"""
+        self.canvas.xview(*args)
+        self.mark_dirty('notes')
+        self._schedule_redraw()
+    
+    def on_canvas_configure(self, event):
+        """画布尺寸变化时重新计算可见音符"""
+        self.mark_dirty('notes')
+        self._schedule_redraw()
+    
     def new_project(self):
         """新建项目"""
         self.project = Project("新项目", ProjectSettings(total_duration=120.0))
-        self.tracks_tree.delete(*self.tracks_tree.get_children())
+        self._cleanup_orphan_temp_dirs()
+        self._populate_tracks_tree([])
         self.project_name_var.set("新项目")
+        self.mark_dirty()
         self.redraw_all()
         self.status_var.set("已创建新项目")
     
@@ -349,15 +711,9 @@ class PyUTAUComponent(ttk.Frame):
                 self.project_name_var.set(self.project.name)
                 
                 # 更新音轨列表
-                self.tracks_tree.delete(*self.tracks_tree.get_children())
-                for track in self.project.tracks:
-                    self.tracks_tree.insert("", "end", values=(
-                        track.name,
-                        Path(track.voice_library_path).name if track.voice_library_path else "无",
-                        "✓" if track.muted else "",
-                        "✓" if track.solo else ""
-                    ))
+                self._populate_tracks_tree(self.project.tracks)
                 
+                self.mark_dirty()
                 self.redraw_all()
                 self.status_var.set(f"已打开项目: {self.project.name}")
                 
@@ -392,13 +748,10 @@ class PyUTAUComponent(ttk.Frame):
         if file_path:
             try:
                 self.status_var.set("正在导入 UST 文件...")
-                self.update()
-                
-                # 创建 UST 解析器
-                parser = USTParser()
+                self.update_idletasks()
                 
                 # 解析 UST 文件
-                imported_project = parser.parse_ust_file(Path(file_path))
+                imported_project = self._ust_parser.parse_ust_file(Path(file_path))
                 
                 # 合并到当前项目或替换
                 if messagebox.askyesno("导入 UST", "是否替换当前项目？\n选择'否'将添加到新音轨"):
@@ -406,14 +759,7 @@ class PyUTAUComponent(ttk.Frame):
                     self.project_name_var.set(imported_project.name)
                     
                     # 更新音轨列表
-                    self.tracks_tree.delete(*self.tracks_tree.get_children())
-                    for track in imported_project.tracks:
-                        self.tracks_tree.insert("", "end", values=(
-                            track.name,
-                            Path(track.voice_library_path).name if track.voice_library_path else "无",
-                            "✓" if track.muted else "",
-                            "✓" if track.solo else ""
-                        ))
+                    self._populate_tracks_tree(imported_project.tracks)
                 else:
                     # 添加到新音轨
                     for track in imported_project.tracks:
@@ -423,13 +769,9 @@ class PyUTAUComponent(ttk.Frame):
                             new_track.add_note(note)
                         
                         # 添加到树形视图
-                        self.tracks_tree.insert("", "end", values=(
-                            new_track.name,
-                            Path(new_track.voice_library_path).name if new_track.voice_library_path else "无",
-                            "✓" if new_track.muted else "",
-                            "✓" if new_track.solo else ""
-                        ))
+                        self._insert_track_row(new_track)
                 
+                self.mark_dirty()
                 self.redraw_all()
                 self.status_var.set(f"成功导入 UST 文件: {Path(file_path).name}")
                 
@@ -455,13 +797,10 @@ class PyUTAUComponent(ttk.Frame):
         if file_path:
             try:
                 self.status_var.set("正在导出 UST 文件...")
-                self.update()
-                
-                # 创建 UST 解析器
-                parser = USTParser()
+                self.update_idletasks()
                 
                 # 导出 UST 文件
-                success = parser.export_to_ust(self.project, Path(file_path))
+                success = self._ust_parser.export_to_ust(self.project, Path(file_path))
                 
                 if success:
                     self.status_var.set(f"成功导出 UST 文件: {Path(file_path).name}")
@@ -480,18 +819,13 @@ class PyUTAUComponent(ttk.Frame):
             messagebox.showwarning("警告", "没有可播放的音轨")
             return
         
+        self._get_or_synthesize("正在合成...", self._on_play_ready, "播放失败")
+    
+    def _on_play_ready(self, audio_data):
+        """合成完成后播放音频"""
         try:
-            self.status_var.set("正在合成...")
-            self.update()
-            
-            # 合成整个项目
-            audio_data = self.engine.synthesize_project(self.project)
-            
-            # 播放音频
             self.try_play_audio(audio_data)
-            
-            self.status_var.set("播放完成")
-            
+            self.status_var.set("正在播放")
         except Exception as e:
             messagebox.showerror("错误", f"播放失败: {e}")
             self.status_var.set("播放失败")
@@ -508,31 +842,79 @@ class PyUTAUComponent(ttk.Frame):
         )
         
         if file_path:
-            try:
-                self.status_var.set("正在导出...")
-                self.update()
-                
-                # 合成整个项目
-                audio_data = self.engine.synthesize_project(self.project)
-                self.engine.export_audio(audio_data, file_path)
-                
-                self.status_var.set(f"已导出: {Path(file_path).name}")
-                messagebox.showinfo("成功", f"音频已导出到: {file_path}")
-                
-            except Exception as e:
-                messagebox.showerror("错误", f"导出失败: {e}")
-                self.status_var.set("导出失败")
+            def on_ready(audio_data):
+                try:
+                    self.engine.export_audio(self._to_pcm16(audio_data), file_path)
+                    self.status_var.set(f"已导出: {Path(file_path).name}")
+                    messagebox.showinfo("成功", f"音频已导出到: {file_path}")
+                except Exception as e:
+                    messagebox.showerror("错误", f"导出失败: {e}")
+                    self.status_var.set("导出失败")
+            
+            self._get_or_synthesize("正在导出...", on_ready, "导出失败")
+    
+    def _get_or_synthesize(self, status, on_ready, error_status):
+        """获取项目音频：命中缓存时直接返回，否则在后台线程合成，
+        完成后在主线程调用 on_ready(audio_data)"""
+        if self._synth_busy:
+            return
+        
+        # 项目内容未变时直接复用上次的合成结果
+        key = _project_fingerprint(self.project)
+        if key in self._audio_cache:
+            self._audio_cache.move_to_end(key)
+            on_ready(self._audio_cache[key])
+            return
+        
+        self._synth_busy = True
+        self._play_btn.config(state='disabled')
+        self._export_btn.config(state='disabled')
+        self.status_var.set(status)
+        
+        # 合成使用项目快照，合成期间的编辑不会影响正在进行的合成
+        project = copy.deepcopy(self.project)
+        threading.Thread(target=self._synth_worker, args=(key, project), daemon=True).start()
+        self.after(100, self._poll_audio, on_ready, error_status)
+    
+    def _synth_worker(self, key, project):
+        """后台合成线程"""
+        try:
+            with self._engine_lock:
+                audio_data = self.engine.synthesize_project(project)
+            self._audio_queue.put((key, audio_data, None))
+        except Exception as e:
+            self._audio_queue.put((key, None, e))
+    
+    def _poll_audio(self, on_ready, error_status):
+        """轮询后台合成结果"""
+        try:
+            key, audio_data, error = self._audio_queue.get_nowait()
+        except queue.Empty:
+            self.after(100, self._poll_audio, on_ready, error_status)
+            return
+        
+        self._synth_busy = False
+        self._play_btn.config(state='normal')
+        self._export_btn.config(state='normal')
+        if self._cleanup_pending:
+            self._cleanup_orphan_temp_dirs()
+        
+        if error is not None:
+            messagebox.showerror("错误", f"{error_status}: {error}")
+            self.status_var.set(error_status)
+            return
+        
+        self._audio_cache[key] = audio_data
+        while len(self._audio_cache) > self._audio_cache_size:
+            self._audio_cache.popitem(last=False)
+        
+        on_ready(audio_data)
     
     def on_canvas_click(self, event):
         """画布点击事件 - 需要重写为多音轨版本"""
-        # 获取画布坐标
-        x = self.canvas.canvasx(event.x)
-        y = self.canvas.canvasy(event.y)
-        
-        # 计算时间和音高
-        pixels_per_second = 50 * self.current_zoom
-        time = (x - 50) / pixels_per_second if x > 50 else 0
-        pitch = 127 - int(y / 15)  # 假设每个音符高度为15像素
+        # 由画布坐标计算时间和音高
+        time = self._px2time(self.canvas.canvasx(event.x))
+        pitch = self._y2pitch(self.canvas.canvasy(event.y))
         
         if self.edit_mode == "write":
             # 编写模式：添加新音符
@@ -546,6 +928,7 @@ class PyUTAUComponent(ttk.Frame):
                     duration=1.0  # 默认1秒
                 )
                 current_track.add_note(note)
+                self.mark_dirty('notes')
                 self.redraw_all()
                 self.status_var.set(f"添加音符: 音高{pitch}, 时间{time:.2f}s")
         else:
@@ -556,6 +939,7 @@ class PyUTAUComponent(ttk.Frame):
                 note_idx = current_track.get_note_at_position(time, pitch)
                 if note_idx is not None:
                     self.selected_note_indices = {current_track_idx: note_idx}
+                    self.mark_dirty('notes')
                     self.redraw_all()
                     self.status_var.set(f"选择音符: 音轨{current_track_idx+1}, 音符{note_idx+1}")
     
@@ -564,14 +948,9 @@ class PyUTAUComponent(ttk.Frame):
         if not self.selected_note_indices:
             return
         
-        # 获取画布坐标
-        x = self.canvas.canvasx(event.x)
-        y = self.canvas.canvasy(event.y)
-        
-        # 计算时间和音高
-        pixels_per_second = 50 * self.current_zoom
-        time = (x - 50) / pixels_per_second if x > 50 else 0
-        pitch = 127 - int(y / 15)  # 假设每个音符高度为15像素
+        # 由画布坐标计算时间和音高
+        time = self._px2time(self.canvas.canvasx(event.x))
+        pitch = self._y2pitch(self.canvas.canvasy(event.y))
         
         # 更新选中的音符
         for track_idx, note_idx in self.selected_note_indices.items():
@@ -581,7 +960,11 @@ class PyUTAUComponent(ttk.Frame):
                     note = track.notes[note_idx]
                     note.start_time = time
                     note.pitch = pitch
-                    self.redraw_all()
+                    track.invalidate_index()
+                    # 只移动被拖拽的音符项，没有缓存项时再合并重绘
+                    if not self._move_note_items(track_idx, note_idx, note):
+                        self.mark_dirty('notes')
+                        self._schedule_redraw()
     
     def on_canvas_release(self, event):
         """画布释放事件"""
@@ -589,14 +972,9 @@ class PyUTAUComponent(ttk.Frame):
     
     def on_canvas_right_click(self, event):
         """画布右键点击 - 需要重写为多音轨版本"""
-        # 获取画布坐标
-        x = self.canvas.canvasx(event.x)
-        y = self.canvas.canvasy(event.y)
-        
-        # 计算时间和音高
-        pixels_per_second = 50 * self.current_zoom
-        time = (x - 50) / pixels_per_second if x > 50 else 0
-        pitch = 127 - int(y / 15)  # 假设每个音符高度为15像素
+        # 由画布坐标计算时间和音高
+        time = self._px2time(self.canvas.canvasx(event.x))
+        pitch = self._y2pitch(self.canvas.canvasy(event.y))
         
         # 删除音符
         current_track_idx = self.project.current_track_index
@@ -605,19 +983,15 @@ class PyUTAUComponent(ttk.Frame):
             note_idx = current_track.get_note_at_position(time, pitch)
             if note_idx is not None:
                 current_track.remove_note(note_idx)
+                self.mark_dirty('notes')
                 self.redraw_all()
                 self.status_var.set(f"删除音符: 音轨{current_track_idx+1}, 音符{note_idx+1}")
     
     def on_canvas_double_click(self, event):
         """画布双击事件 - 需要重写为多音轨版本"""
-        # 获取画布坐标
-        x = self.canvas.canvasx(event.x)
-        y = self.canvas.canvasy(event.y)
-        
-        # 计算时间和音高
-        pixels_per_second = 50 * self.current_zoom
-        time = (x - 50) / pixels_per_second if x > 50 else 0
-        pitch = 127 - int(y / 15)  # 假设每个音符高度为15像素
+        # 由画布坐标计算时间和音高
+        time = self._px2time(self.canvas.canvasx(event.x))
+        pitch = self._y2pitch(self.canvas.canvasy(event.y))
         
         # 编辑音符属性
         current_track_idx = self.project.current_track_index
@@ -626,9 +1000,9 @@ class PyUTAUComponent(ttk.Frame):
             note_idx = current_track.get_note_at_position(time, pitch)
             if note_idx is not None:
                 note = current_track.notes[note_idx]
-                self.edit_note_properties(note)
+                self.edit_note_properties(note, current_track)
     
-    def edit_note_properties(self, note):
+    def edit_note_properties(self, note, track=None):
         """编辑音符属性"""
         # 创建编辑对话框
         dialog = tk.Toplevel(self)
@@ -659,6 +1033,9 @@ class PyUTAUComponent(ttk.Frame):
             note.lyric = lyric_var.get()
             note.pitch = pitch_var.get()
             note.duration = duration_var.get()
+            if track is not None:
+                track.invalidate_index()
+            self.mark_dirty('notes')
             self.redraw_all()
             dialog.destroy()
         
@@ -668,37 +1045,89 @@ class PyUTAUComponent(ttk.Frame):
         ttk.Button(button_frame, text="保存", command=save_changes).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
     
+    def mark_dirty(self, *layers):
+        """标记需要重绘的图层（'bg' / 'tracks' / 'notes'），不传参数表示全部"""
+        for layer in layers or self._dirty:
+            self._dirty[layer] = True
+    
     def redraw_all(self):
-        """重绘所有内容"""
-        self.canvas.delete("all")
-        self.draw_piano_roll_background()
-        self.draw_tracks()
-        self.draw_notes()
+        """重绘所有已失效的图层"""
+        dirty = self._dirty
+        if dirty['bg']:
+            self.canvas.delete("background")
+            self.draw_piano_roll_background()
+            self.canvas.tag_lower("background")
+        if dirty['tracks']:
+            self.canvas.delete("tracks")
+            self.draw_tracks()
+            self.canvas.tag_raise("notes")
+        if dirty['notes']:
+            # 音符项由 draw_notes 复用更新，不整体删除
+            self.draw_notes()
+        for layer in dirty:
+            dirty[layer] = False
+    
+    def _schedule_redraw(self):
+        """在空闲时重绘，合并同一轮事件循环中的多次请求"""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._do_redraw)
+    
+    def _do_redraw(self):
+        """执行已安排的重绘"""
+        self._redraw_pending = False
+        self.redraw_all()
+    
+    def _move_note_items(self, track_idx, note_idx, note):
+        """直接更新单个音符的画布坐标，成功返回 True"""
+        items = self._note_items.get((track_idx, note_idx))
+        if items is None:
+            return False
+        
+        track_height = 30
+        pixels_per_second = self._pps
+        y = 50 + track_idx * track_height + (127 - note.pitch) * (track_height / 128)
+        x_start = 50 + note.start_time * pixels_per_second
+        x_end = x_start + note.duration * pixels_per_second
+        
+        self.canvas.coords(items[0], x_start, y, x_end, y + 5)
+        if items[1] is not None:
+            self.canvas.coords(items[1], x_start + 2, y + 2)
+        return True
     
     def draw_piano_roll_background(self):
         """绘制钢琴卷帘背景 - 需要适应长时长"""
-        # 绘制钢琴键盘（左侧）
-        for i in range(128):
-            y = (127 - i) * 15
-            is_white_key = i % 12 in [0, 2, 4, 5, 7, 9, 11]
-            color = 'white' if is_white_key else 'lightgray'
-            outline = 'black' if is_white_key else 'darkgray'
-            
-            self.canvas.create_rectangle(
-                0, y, 50, y + 15, 
-                fill=color, outline=outline, tags="background"
-            )
+        # 绘制钢琴键盘（左侧），整条键盘为一张缓存图片
+        self.canvas.create_image(
+            0, 0, image=self._get_keyboard_image(), anchor=tk.NW, tags="background"
+        )
         
         # 绘制时间线（适应长时长）
         total_seconds = int(self.project.settings.total_duration)
-        pixels_per_second = 50 * self.current_zoom
+        pixels_per_second = self._pps
         
-        for second in range(0, total_seconds + 1, 5):  # 每5秒一条线
-            x = second * pixels_per_second
+        seconds = np.arange(0, total_seconds + 1, 5)  # 每5秒一条线
+        xs = seconds * pixels_per_second
+        for second, x in zip(seconds.tolist(), xs.tolist()):
             self.canvas.create_line(x, 0, x, 2000, fill='lightgray', tags="background")
             if second % 10 == 0:  # 每10秒一个标签
                 self.canvas.create_text(x, 10, text=f"{second}s", tags="background", font=("Arial", 8))
     
+    def _get_keyboard_image(self):
+        """生成钢琴键盘图片，只渲染一次"""
+        if self._keyboard_img is None:
+            keys = np.arange(128)
+            ys = (127 - keys) * 15
+            is_white = np.isin(keys % 12, (0, 2, 4, 5, 7, 9, 11))
+            
+            img = tk.PhotoImage(master=self.canvas, width=51, height=128 * 15 + 1)
+            for y, white in zip(ys.tolist(), is_white.tolist()):
+                # 先画边框色，再用填充色覆盖内部
+                img.put('black' if white else 'darkgray', to=(0, y, 51, y + 16))
+                img.put('white' if white else 'lightgray', to=(1, y + 1, 50, y + 15))
+            self._keyboard_img = img
+        return self._keyboard_img
+    
     def draw_tracks(self):
         """绘制音轨"""
         track_height = 30
@@ -718,55 +1147,146 @@ class PyUTAUComponent(ttk.Frame):
                 text=track.name, anchor=tk.W, tags="tracks", font=("Arial", 9)
             )
     
+    def _visible_x_range(self):
+        """返回当前可见的画布横坐标范围"""
+        frac0, frac1 = self.canvas.xview()
+        width = float(self.canvas.cget('scrollregion').split()[2])
+        return frac0 * width, frac1 * width
+    
     def draw_notes(self):
-        """绘制所有音轨的音符"""
+        """绘制可见区域内的音符 - 复用已有画布项，只更新坐标和样式"""
         track_height = 30
-        pixels_per_second = 50 * self.current_zoom
+        pixels_per_second = self._pps
+        pitch_scale = track_height / 128
+        min_lyric_width = 12  # 音符窄于此宽度（像素）时不显示歌词
+        view_x0, view_x1 = self._visible_x_range()
+        seen = set()
         
         for track_idx, track in enumerate(self.project.tracks):
-            y_offset = 50 + track_idx * track_height
+            notes = track.notes
+            if not notes:
+                continue
+            
+            # 一次性计算整条音轨的坐标
+            starts, durations, pitches, lyrics = track.as_soa()
+            x_starts = 50 + starts * pixels_per_second
+            x_ends = x_starts + durations * pixels_per_second
+            ys = 50 + track_idx * track_height + (127 - pitches) * pitch_scale
+            
+            selected_idx = self.selected_note_indices.get(track_idx)
+            
+            # 跳过可见区域之外的音符
+            visible = np.nonzero((x_starts < view_x1) & (x_ends > view_x0))[0]
             
-            for note_idx, note in enumerate(track.notes):
-                y = y_offset + (127 - note.pitch) * (track_height / 128)
-                x_start = 50 + note.start_time * pixels_per_second
-                x_end = x_start + note.duration * pixels_per_second
+            for note_idx, x_start, x_end, y in zip(
+                    visible.tolist(), x_starts[visible].tolist(),
+                    x_ends[visible].tolist(), ys[visible].tolist()):
+                lyric = lyrics[note_idx]
+                key = (track_idx, note_idx)
+                seen.add(key)
                 
                 # 确定颜色
-                is_selected = (self.selected_note_indices.get(track_idx) == note_idx)
+                is_selected = (selected_idx == note_idx)
                 fill_color = 'orange' if is_selected else 'lightblue'
                 outline_color = 'red' if is_selected else 'blue'
                 
-                # 绘制音符
-                self.canvas.create_rectangle(
-                    x_start, y, x_end, y + 5,
-                    fill=fill_color, outline=outline_color, tags="notes", width=1
-                )
+                items = self._note_items.get(key)
+                if items is None:
+                    # 绘制音符
+                    rect_id = self.canvas.create_rectangle(
+                        x_start, y, x_end, y + 5,
+                        fill=fill_color, outline=outline_color, tags="notes", width=1
+                    )
+                    items = self._note_items[key] = [rect_id, None, fill_color, None]
+                else:
+                    self.canvas.coords(items[0], x_start, y, x_end, y + 5)
+                    if items[2] != fill_color:
+                        self.canvas.itemconfigure(items[0], fill=fill_color, outline=outline_color)
+                        items[2] = fill_color
                 
-                # 显示歌词
-                self.canvas.create_text(
-                    x_start + 2, y + 2,
-                    text=note.lyric, anchor=tk.W, tags="notes", font=("Arial", 6)
-                )
+                # 显示歌词（缩小到看不清时省略）
+                text_id = items[1]
+                if x_end - x_start < min_lyric_width:
+                    if text_id is not None:
+                        self.canvas.delete(text_id)
+                        items[1] = None
+                elif text_id is None:
+                    items[1] = self.canvas.create_text(
+                        x_start + 2, y + 2,
+                        text=lyric, anchor=tk.W, tags="notes", font=("Arial", 6)
+                    )
+                    items[3] = lyric
+                else:
+                    self.canvas.coords(text_id, x_start + 2, y + 2)
+                    if items[3] != lyric:
+                        self.canvas.itemconfigure(text_id, text=lyric)
+                        items[3] = lyric
+        
+        # 删除已不存在的音符项
+        for key in [k for k in self._note_items if k not in seen]:
+            rect_id, text_id = self._note_items.pop(key)[:2]
+            self.canvas.delete(rect_id)
+            if text_id is not None:
+                self.canvas.delete(text_id)
     
     def clear_notes(self):
         """清除当前音轨的音符"""
         current_track = self.project.get_current_track()
         if current_track:
             current_track.clear_notes()
+            self.mark_dirty('notes')
             self.redraw_all()
             self.status_var.set(f"已清除音轨 '{current_track.name}' 的音符")
     
     def try_play_audio(self, audio_data):
-        """尝试播放音频 - 使用 sounddevice 替代 simpleaudio"""
-        try:
-            import sounddevice as sd
-            # 使用 sounddevice 播放音频
-            sd.play(audio_data, self.engine.sample_rate)
-            sd.wait()  # 等待播放完成
-        except ImportError:
+        """尝试播放音频 - 使用 sounddevice 输出流，非阻塞"""
+        sd = _get_sd()
+        if sd is None:
             # 如果 sounddevice 不可用，尝试其他方法
-            self.fallback_audio_playback(audio_data)
-
+            self.fallback_audio_playback(self._to_pcm16(audio_data))
+            return
+        
+        stream = self._get_output_stream(sd)
+        if not stream.stopped:
+            stream.abort()
+        
+        # 回调在 PortAudio 线程中逐块取数据，无需一次性写入整段音频
+        self._play_data = self._to_pcm16(audio_data).reshape(-1, 1)
+        self._play_pos = 0
+        stream.start()
+    
+    def _get_output_stream(self, sd):
+        """获取输出流，首次调用时打开"""
+        if self._stream is None:
+            self._stream = sd.OutputStream(
+                samplerate=self.engine.sample_rate,
+                channels=1,
+                dtype='int16',
+                blocksize=1024,
+                callback=self._stream_callback
+            )
+        return self._stream
+    
+    def _stream_callback(self, outdata, frames, time, status):
+        """输出流回调：复制下一块音频，播放完毕后停止流"""
+        data, pos = self._play_data, self._play_pos
+        n = 0
+        if data is not None:
+            n = min(frames, len(data) - pos)
+            outdata[:n] = data[pos:pos + n]
+        self._play_pos = pos + n
+        if n < frames:
+            outdata[n:] = 0
+            raise _sd.CallbackStop
+    
+    def _to_pcm16(self, audio_data):
+        """量化为16位PCM，同一缓冲区只转换一次（播放与导出共用）"""
+        source, pcm = self._pcm16
+        if source is not audio_data:
+            pcm = self.engine.to_pcm16(audio_data)
+            self._pcm16 = (audio_data, pcm)
+        return pcm
+    
     def fallback_audio_playback(self, audio_data):
         """后备音频播放方案"""
         try:
@@ -787,23 +1307,22 @@ class PyUTAUComponent(ttk.Frame):
             try:
                 import tempfile
                 import os
-                from scipy.io import wavfile
                 
                 # 创建临时 WAV 文件
                 with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
                     temp_path = temp_file.name
                 
                 # 保存为 WAV 文件
-                wavfile.write(temp_path, self.engine.sample_rate, audio_data)
+                _write_wav_pcm16(temp_path, audio_data, self.engine.sample_rate)
                 
-                # 使用系统默认播放器播放
+                # 使用系统默认播放器播放（不经过 shell，也不等待播放结束）
                 if os.name == 'nt':  # Windows
-                    os.system(f'start {temp_path}')
-                elif os.name == 'posix':  # macOS 或 Linux
-                    if os.uname().sysname == 'Darwin':  # macOS
-                        os.system(f'afplay {temp_path}')
-                    else:  # Linux
-                        os.system(f'aplay {temp_path}')
+                    os.startfile(temp_path)
+                else:  # macOS 或 Linux
+                    subprocess.Popen(
+                        [_SYSTEM_PLAYERS.get(_SYSTEM, 'aplay'), temp_path],
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                    )
                 
                 # 提示用户文件位置
                 self.status_var.set(f"音频已保存到临时文件: {temp_path}")
@@ -818,27 +1337,52 @@ class PyUTAUComponent(ttk.Frame):
                     f"错误详情: {e}")    
     def stop(self):
         """停止播放"""
-        try:
-            # 尝试停止 sounddevice 播放
-            import sounddevice as sd
-            sd.stop()
-        except ImportError:
-            pass
-        except Exception:
-            pass
+        if self._stream is not None:
+            try:
+                # 立即中断输出流，丢弃未播放的缓冲
+                self._stream.abort()
+            except Exception:
+                pass
         
         # 更新状态
         self.status_var.set("播放停止")
         
+    def _cleanup_orphan_temp_dirs(self):
+        """释放已没有音轨使用的解压目录（持久缓存只卸载，不删除）"""
+        # 组件已销毁时目录由终结器统一清理
+        if not self._temp_dirs_finalizer.alive:
+            return
+        # 合成线程正在使用引擎时推迟到合成结束（见 _poll_audio）
+        if not self._engine_lock.acquire(blocking=False):
+            self._cleanup_pending = True
+            return
+        self._cleanup_pending = False
+        try:
+            in_use = {track.voice_library_path for track in self.project.tracks}
+            for key, temp_dir in list(self.temp_dirs.items()):
+                if temp_dir not in in_use:
+                    self.engine.unload_voice_library(temp_dir)
+                    if not _is_persistent_dir(temp_dir):
+                        shutil.rmtree(temp_dir, ignore_errors=True)
+                    del self.temp_dirs[key]
+        finally:
+            self._engine_lock.release()
+    
     def destroy(self):
         """销毁组件时清理资源"""
-        # 清理所有临时目录
-        for temp_dir in self.temp_dirs.values():
-            if os.path.exists(temp_dir):
-                import shutil
-                try:
-                    shutil.rmtree(temp_dir)
-                except:
-                    pass
+        if self._stream is not None:
+            try:
+                self._stream.close(ignore_errors=True)
+            except Exception:
+                pass
+        
+        # 关闭合成引擎的常驻进程池
+        self.engine.cleanup()
+        
+        # 在后台线程中清理临时目录，关闭界面时不等待磁盘 I/O；
+        # 该线程先等待进行中的合成结束再删除目录
+        # （非守护线程，解释器退出前会等待其完成；finalize 只会执行一次）
+        threading.Thread(target=_release_when_idle,
+                         args=(self._engine_lock, self._temp_dirs_finalizer)).start()
         super().destroy()
 
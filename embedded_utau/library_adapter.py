@@ -1,7 +1,12 @@
 # embedded_utau/library_adapter.py
+import mmap
 import os
+import re
+import struct
 import tempfile
+import weakref
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 import shutil
@@ -9,17 +14,72 @@ import shutil
 from .voice_library import VoiceLibrary, VoiceSample
 from .library_detector import LibraryDetector
 
+# 解压 ZIP 声库时只需要的文件（VoiceLibrary 会读取的文件）
+_LIBRARY_FILE_NAMES = {
+    "oto.ini", "character.yaml", "character.yml", "character.txt",
+    "readme.txt", "info.txt", "キャラクター.txt",
+}
+_LIBRARY_FILE_EXTS = {".wav", ".mp3", ".flac", ".ogg", ".bmp"}
+
+# 从文件名提取歌词用的正则
+_RE_CLEAN = re.compile(r'[\d_\-\.]')
+
+
+def _is_kana(o: int) -> bool:
+    """平假名 ぁ-ん、片假名 ァ-ン 或长音符 ー"""
+    return 0x3041 <= o <= 0x3093 or 0x30A1 <= o <= 0x30F3 or o == 0x30FC
+
+
+def _stored_data_range(archive, info: zipfile.ZipInfo) -> Optional[Tuple[int, int]]:
+    """返回未压缩（STORED）条目数据在 ZIP 文件中的 (偏移, 长度)，不适用时返回 None"""
+    if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+        return None  # 已压缩或已加密
+    header = archive[info.header_offset:info.header_offset + zipfile.sizeFileHeader]
+    if len(header) != zipfile.sizeFileHeader:
+        return None
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    if fields[0] != zipfile.stringFileHeader:
+        return None
+    # 本地文件头之后依次是文件名和扩展字段，然后才是数据
+    offset = info.header_offset + zipfile.sizeFileHeader + fields[10] + fields[11]
+    if offset + info.file_size > len(archive):
+        return None
+    return offset, info.file_size
+
+
+def _cleanup_dirs(temp_dirs: dict):
+    """删除登记的临时目录并清空登记表"""
+    for temp_dir in temp_dirs.values():
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    temp_dirs.clear()
+
+
 class LibraryAdapter:
     """通用声库适配器"""
     
     def __init__(self):
         self.supported_formats = ["utau", "vocaloid", "cevio", "generic_audio"]
         self.temp_dirs = {}
+        # 适配器被回收或解释器退出时自动删除临时目录
+        self._finalizer = weakref.finalize(self, _cleanup_dirs, self.temp_dirs)
     
     def load_library(self, library_path: Path, target_dir: Optional[Path] = None) -> Tuple[Optional[VoiceLibrary], str]:
         """加载任意格式的声库"""
         library_path = Path(library_path)
         
+        # ZIP 文件只打开一次，检测和解压共用
+        if library_path.suffix.lower() == '.zip':
+            try:
+                with zipfile.ZipFile(library_path, 'r') as zip_ref:
+                    library_type = LibraryDetector.detect_names_library_type(zip_ref.namelist())
+                    print(f"检测到声库类型: {library_type}")
+                    if library_type not in self.supported_formats:
+                        return None, f"不支持的声库格式: {library_type}"
+                    return self._handle_zip_library(library_path, library_type, target_dir, zip_ref)
+            except (zipfile.BadZipFile, OSError) as e:
+                print(f"检测 ZIP 声库类型失败: {e}")
+                return None, "不支持的声库格式: unknown"
+        
         # 检测声库类型
         library_type = LibraryDetector.detect_library_type(library_path)
         print(f"检测到声库类型: {library_type}")
@@ -27,18 +87,15 @@ class LibraryAdapter:
         if library_type not in self.supported_formats:
             return None, f"不支持的声库格式: {library_type}"
         
-        # 处理 ZIP 文件
-        if library_path.suffix.lower() == '.zip':
-            return self._handle_zip_library(library_path, library_type, target_dir)
-        
         # 处理目录
         if library_path.is_dir():
             return self._handle_directory_library(library_path, library_type, target_dir)
         
         return None, "无法处理的声库格式"
     
-    def _handle_zip_library(self, zip_path: Path, library_type: str, target_dir: Optional[Path]) -> Tuple[Optional[VoiceLibrary], str]:
-        """处理 ZIP 格式声库"""
+    def _handle_zip_library(self, zip_path: Path, library_type: str, target_dir: Optional[Path],
+                            zip_ref: Optional[zipfile.ZipFile] = None) -> Tuple[Optional[VoiceLibrary], str]:
+        """处理 ZIP 格式声库（可传入已打开的 ZipFile，避免重复解析目录）"""
         try:
             # 创建临时目录
             if target_dir is None:
@@ -48,9 +105,12 @@ class LibraryAdapter:
                 temp_dir = str(target_dir)
                 os.makedirs(temp_dir, exist_ok=True)
             
-            # 解压 ZIP 文件
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
+            # 只解压声库会用到的文件
+            if zip_ref is not None:
+                self._extract_library_files(zip_ref, Path(temp_dir))
+            else:
+                with zipfile.ZipFile(zip_path, 'r') as zip_file:
+                    self._extract_library_files(zip_file, Path(temp_dir))
             
             print(f"ZIP 文件解压到: {temp_dir}")
             
@@ -60,6 +120,64 @@ class LibraryAdapter:
         except Exception as e:
             return None, f"处理 ZIP 声库失败: {e}"
     
+    def _extract_library_files(self, zip_ref: zipfile.ZipFile, target_dir: Path):
+        """流式解压 oto.ini、角色信息、头像和音频文件，跳过其他内容
+        
+        未压缩（STORED）的条目直接从内存映射的 ZIP 文件中按范围复制
+        """
+        archive = None
+        if zip_ref.filename:
+            try:
+                with open(zip_ref.filename, 'rb') as f:
+                    archive = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                archive = None
+        try:
+            self._extract_selected_entries(zip_ref, target_dir, archive)
+        finally:
+            if archive is not None:
+                archive.close()
+    
+    def _extract_selected_entries(self, zip_ref: zipfile.ZipFile, target_dir: Path, archive):
+        """按文件名筛选条目，并用线程池并行写出（文件 I/O 和解压都会释放 GIL）"""
+        jobs = []
+        for info in zip_ref.infolist():
+            if info.is_dir():
+                continue
+            name = info.filename.replace('\\', '/')
+            basename = name.rsplit('/', 1)[-1]
+            if (basename.lower() not in _LIBRARY_FILE_NAMES
+                    and os.path.splitext(basename)[1].lower() not in _LIBRARY_FILE_EXTS):
+                continue
+            
+            # 与 extractall 一样拒绝绝对路径和 ".." 路径
+            parts = [p for p in name.split('/') if p not in ('', '.')]
+            if not parts or '..' in parts or ':' in parts[0]:
+                continue
+            target = target_dir.joinpath(*parts)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            jobs.append((info, target))
+        
+        def write_entry(job):
+            info, target = job
+            data_range = _stored_data_range(archive, info) if archive is not None else None
+            if data_range is not None:
+                offset, size = data_range
+                with open(target, 'wb') as dst, memoryview(archive) as view:
+                    dst.write(view[offset:offset + size])
+                return
+            
+            with zip_ref.open(info) as src, open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst, length=1 << 18)
+        
+        if len(jobs) <= 1:
+            for job in jobs:
+                write_entry(job)
+            return
+        with ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) * 2, len(jobs))) as executor:
+            # list() 取出结果，使工作线程中的异常在这里抛出
+            list(executor.map(write_entry, jobs))
+    
     def _handle_directory_library(self, dir_path: Path, library_type: str, target_dir: Optional[Path]) -> Tuple[Optional[VoiceLibrary], str]:
         """处理目录格式声库"""
         try:
@@ -84,7 +202,7 @@ class LibraryAdapter:
         """为通用音频库创建 oto.ini"""
         oto_path = Path(target_dir) / "oto.ini"
         
-        audio_files = list(Path(target_dir).glob("*.wav")) + list(Path(target_dir).glob("*.mp3"))
+        audio_files = [p for p in Path(target_dir).iterdir() if p.suffix in ('.wav', '.mp3')]
         
         with open(oto_path, 'w', encoding='utf-8') as f:
             for audio_file in audio_files:
@@ -95,22 +213,19 @@ class LibraryAdapter:
     
     def _extract_lyric_from_filename(self, filename: str) -> str:
         """从文件名提取歌词"""
-        import re
-        
         # 移除数字和常见符号
-        cleaned = re.sub(r'[\d_\-\.]', '', filename)
-        
-        # 如果是日文，提取第一个假名
-        japanese_pattern = r'[ぁ-んァ-ンー]'
-        japanese_chars = re.findall(japanese_pattern, cleaned)
-        if japanese_chars:
-            return japanese_chars[0]
+        cleaned = _RE_CLEAN.sub('', filename)
         
-        # 如果是中文，提取第一个汉字
-        chinese_pattern = r'[\u4e00-\u9fff]'
-        chinese_chars = re.findall(chinese_pattern, cleaned)
-        if chinese_chars:
-            return chinese_chars[0]
+        # 一次遍历：日文优先返回第一个假名，否则返回第一个汉字
+        first_hanzi = None
+        for c in cleaned:
+            o = ord(c)
+            if _is_kana(o):
+                return c
+            if first_hanzi is None and 0x4E00 <= o <= 0x9FFF:
+                first_hanzi = c
+        if first_hanzi is not None:
+            return first_hanzi
         
         # 否则返回前2个字母
         return cleaned[:2] if len(cleaned) >= 2 else cleaned
@@ -142,11 +257,5 @@ class LibraryAdapter:
     
     def cleanup_temp_dirs(self):
         """清理临时目录"""
-        for temp_dir in self.temp_dirs.values():
-            if os.path.exists(temp_dir):
-                try:
-                    shutil.rmtree(temp_dir)
-                except:
-                    pass
-        self.temp_dirs.clear()
+        _cleanup_dirs(self.temp_dirs)
 
@@ -1,10 +1,27 @@
 # embedded_utau/library_detector.py
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 import zipfile
 import tempfile
 
+# ZIP 内文件特征标志
+_HAS_OTO = 1
+_HAS_VPR = 2
+_HAS_CHARACTER = 4
+_HAS_WAV = 8
+_HAS_VOICE = 16
+_HAS_CCS = 32
+
+
+@lru_cache(maxsize=64)
+def _detect_zip_cached(zip_path: str, mtime_ns: int, size: int) -> str:
+    """按 (路径, 修改时间, 大小) 缓存 ZIP 检测结果，文件变化后自动失效"""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        return LibraryDetector.detect_names_library_type(zip_ref.namelist())
+
+
 class LibraryDetector:
     """声库类型检测器"""
     
@@ -27,30 +44,45 @@ class LibraryDetector:
     def detect_zip_library_type(zip_path: Path) -> str:
         """检测 ZIP 文件中的声库类型"""
         try:
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                file_list = zip_ref.namelist()
-                
-                # 检查 UTAU 特征文件
-                if any('oto.ini' in f.lower() for f in file_list):
-                    return "utau"
-                
-                # 检查 Vocaloid 特征文件
-                if any('.vpr' in f.lower() for f in file_list):
-                    return "vocaloid"
-                if any('character.txt' in f.lower() for f in file_list) and any('.wav' in f.lower() for f in file_list):
-                    return "vocaloid"
-                
-                # 检查 CeVIO 特征文件
-                if any('.voice' in f.lower() for f in file_list):
-                    return "cevio"
-                if any('.ccs' in f.lower() for f in file_list):
-                    return "cevio"
-                
+            stat = os.stat(zip_path)
+            return _detect_zip_cached(str(zip_path), stat.st_mtime_ns, stat.st_size)
         except Exception as e:
             print(f"检测 ZIP 声库类型失败: {e}")
         
         return "unknown"
     
+    @staticmethod
+    def detect_names_library_type(file_list: Iterable[str]) -> str:
+        """根据 ZIP 内的文件名列表检测声库类型（只遍历一次）"""
+        flags = 0
+        for name in file_list:
+            low = name.lower()
+            if 'oto.ini' in low:
+                # UTAU 优先级最高，可以提前结束
+                return "utau"
+            if '.vpr' in low:
+                flags |= _HAS_VPR
+            if 'character.txt' in low:
+                flags |= _HAS_CHARACTER
+            if '.wav' in low:
+                flags |= _HAS_WAV
+            if '.voice' in low:
+                flags |= _HAS_VOICE
+            if '.ccs' in low:
+                flags |= _HAS_CCS
+        
+        # 检查 Vocaloid 特征文件
+        if flags & _HAS_VPR:
+            return "vocaloid"
+        if flags & _HAS_CHARACTER and flags & _HAS_WAV:
+            return "vocaloid"
+        
+        # 检查 CeVIO 特征文件
+        if flags & (_HAS_VOICE | _HAS_CCS):
+            return "cevio"
+        
+        return "unknown"
+    
     @staticmethod
     def detect_directory_library_type(dir_path: Path) -> str:
         """检测目录中的声库类型"""
@@ -58,24 +90,23 @@ class LibraryDetector:
         if (dir_path / "oto.ini").exists():
             return "utau"
         
+        # 一次遍历收集目录树中出现的扩展名
+        suffixes = {path.suffix for path in dir_path.rglob("*")}
+        
         # 检查 Vocaloid 特征
-        vpr_files = list(dir_path.rglob("*.vpr"))
-        if vpr_files:
+        if ".vpr" in suffixes:
             return "vocaloid"
         
         # 检查是否有 Vocaloid 典型的目录结构
-        if (dir_path / "character.txt").exists() and any(dir_path.rglob("*.wav")):
+        if (dir_path / "character.txt").exists() and ".wav" in suffixes:
             return "vocaloid"
         
         # 检查 CeVIO 特征
-        voice_files = list(dir_path.rglob("*.voice"))
-        ccs_files = list(dir_path.rglob("*.ccs"))
-        if voice_files or ccs_files:
+        if ".voice" in suffixes or ".ccs" in suffixes:
             return "cevio"
         
         # 检查是否有音频文件但无明确格式标识
-        audio_files = list(dir_path.rglob("*.wav")) + list(dir_path.rglob("*.mp3"))
-        if audio_files:
+        if ".wav" in suffixes or ".mp3" in suffixes:
             return "generic_audio"  # 通用音频库
         
         return "unknown"
@@ -1,8 +1,19 @@
 # embedded_utau/note.py
+import sys
 from dataclasses import dataclass
 from typing import List, Dict, Optional
+import numpy as np
 
-@dataclass
+# Python 3.10+ 的 dataclass 支持生成 __slots__，减少每个实例的内存占用
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+_set_attr = object.__setattr__
+
+# 已创建音符的属性被修改的总次数，音轨缓存以此判断音符是否被直接编辑过
+_note_edits = 0
+
+
+@dataclass(init=False, **_SLOTS)
 class Note:
     """音符数据类"""
     lyric: str
@@ -12,15 +23,62 @@ class Note:
     velocity: int = 64
     flags: str = ""
     
+    def __init__(self, lyric: str, pitch: int, start_time: float, duration: float,
+                 velocity: int = 64, flags: str = ""):
+        # 初始化不计为编辑，直接写入字段
+        _set_attr(self, 'lyric', lyric)
+        _set_attr(self, 'pitch', pitch)
+        _set_attr(self, 'start_time', start_time)
+        _set_attr(self, 'duration', duration)
+        _set_attr(self, 'velocity', velocity)
+        _set_attr(self, 'flags', flags)
+        self.__post_init__()
+    
+    def __setattr__(self, name, value):
+        """修改属性时递增全局编辑计数，使各音轨的索引和数组缓存失效"""
+        global _note_edits
+        _note_edits += 1
+        _set_attr(self, name, value)
+    
     def __post_init__(self):
         """初始化后验证数据"""
         if self.duration <= 0:
             print(f"警告: 音符持续时间必须为正数，当前为 {self.duration}")
             self.duration = 0.1  # 设置最小持续时间
 
+class _NoteList(list):
+    """记录修改次数的音符列表，音轨据此判断缓存是否失效"""
+    
+    version = 0
+    
+    def _touch(self):
+        self.version += 1
+
+
+def _touching(name):
+    """包装 list 的修改方法：调用后递增列表版本号"""
+    method = getattr(list, name)
+    
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._touch()
+        return result
+    
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ('append', 'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(_NoteList, _name, _touching(_name))
+
+
 class Track:
     """音轨类 - 支持独立音源库"""
     
+    __slots__ = ('name', 'voice_library_path', '_notes', 'muted', 'solo',
+                 'volume', 'pan', '_index', '_soa')
+    
     def __init__(self, name: str, voice_library_path: str = ""):
         self.name = name
         self.voice_library_path = voice_library_path
@@ -29,24 +87,148 @@ class Track:
         self.solo: bool = False
         self.volume: float = 1.0  # 0.0 到 1.0
         self.pan: float = 0.0     # -1.0 (左) 到 1.0 (右)
+        self._index = None        # 命中测试索引（按开始时间排序的数组），末项为缓存键
+        self._soa = None          # 音符属性数组（按列表顺序，预留容量）：(starts, durations, pitches, lyrics, count, 缓存键)
+    
+    @property
+    def notes(self) -> List[Note]:
+        """音符列表；增删替换音符和修改音符属性都会使缓存自动失效"""
+        return self._notes
+    
+    @notes.setter
+    def notes(self, notes):
+        self._notes = _NoteList(notes)
+    
+    def __getstate__(self):
+        # 缓存不参与序列化/复制
+        state = {name: getattr(self, name) for name in self.__slots__ if hasattr(self, name)}
+        state['_index'] = state['_soa'] = None
+        return state
+    
+    def __setstate__(self, state):
+        for name, value in state.items():
+            # 兼容旧版快照中的 'notes' 字段
+            setattr(self, 'notes' if name == '_notes' else name, value)
+    
+    def _cache_key(self):
+        """当前音符状态的缓存键：(列表对象, 列表版本, 全局音符编辑计数)"""
+        notes = self._notes
+        return notes, notes.version, _note_edits
+    
+    def _is_current(self, key) -> bool:
+        """缓存键是否仍对应当前音符状态"""
+        notes = self._notes
+        return key[0] is notes and key[1] == notes.version and key[2] == _note_edits
     
     def add_note(self, note: Note):
         """添加音符"""
+        index_current = self._index is not None and self._is_current(self._index[-1])
+        soa = self._soa
+        soa_current = soa is not None and self._is_current(soa[-1])
         self.notes.append(note)
+        if index_current:
+            self._insert_into_index(note)
+        else:
+            self._index = None
+        
+        # 数组有效时直接追加，容量不足时翻倍扩容（均摊 O(1)）
+        if not soa_current:
+            self._soa = None
+            return
+        starts, durations, pitches, lyrics, count, _ = soa
+        if count == len(starts):
+            capacity = max(16, count * 2)
+            starts = np.resize(starts, capacity)
+            durations = np.resize(durations, capacity)
+            pitches = np.resize(pitches, capacity)
+        starts[count] = note.start_time
+        durations[count] = note.duration
+        pitches[count] = note.pitch
+        lyrics.append(note.lyric)
+        self._soa = (starts, durations, pitches, lyrics, count + 1, self._cache_key())
     
     def remove_note(self, index: int):
         """移除音符"""
         if 0 <= index < len(self.notes):
             del self.notes[index]
+            self.invalidate_index()
     
     def clear_notes(self):
         """清空所有音符"""
         self.notes.clear()
+        self.invalidate_index()
+    
+    def invalidate_index(self):
+        """丢弃命中测试索引和音符数组（音符修改会自动失效，通常无需调用）"""
+        self._index = None
+        self._soa = None
+    
+    def as_soa(self):
+        """返回音符属性数组 (starts, durations, pitches, lyrics)，按列表顺序排列
+        
+        数组为只读视图，歌词为元组副本，调用方不能借此改动缓存。
+        """
+        if self._soa is None or not self._is_current(self._soa[-1]):
+            notes = self.notes
+            count = len(notes)
+            self._soa = (
+                np.fromiter((n.start_time for n in notes), dtype=np.float64, count=count),
+                np.fromiter((n.duration for n in notes), dtype=np.float64, count=count),
+                np.fromiter((n.pitch for n in notes), dtype=np.int64, count=count),
+                [n.lyric for n in notes],
+                count,
+                self._cache_key(),
+            )
+        starts, durations, pitches, lyrics, count, _ = self._soa
+        views = starts[:count], durations[:count], pitches[:count]
+        for view in views:
+            view.flags.writeable = False
+        return (*views, tuple(lyrics))
+    
+    def _insert_into_index(self, note: Note):
+        """把新追加的音符按开始时间插入已排序的索引（二分定位），无需整体重建"""
+        starts, ends, pitches, order, max_duration, _ = self._index
+        pos = int(np.searchsorted(starts, note.start_time, side='right'))
+        self._index = (
+            np.insert(starts, pos, note.start_time),
+            np.insert(ends, pos, note.start_time + note.duration),
+            np.insert(pitches, pos, note.pitch),
+            np.insert(order, pos, len(self._notes) - 1),
+            max(max_duration, note.duration),
+            self._cache_key(),
+        )
+    
+    def _build_index(self):
+        """构建按开始时间排序的音符数组索引"""
+        starts, durations, pitches, _ = self.as_soa()
+        count = len(starts)
+        
+        order = np.argsort(starts, kind='stable')
+        max_duration = float(durations.max()) if count else 0.0
+        self._index = (starts[order], (starts + durations)[order], pitches[order],
+                       order, max_duration, self._cache_key())
     
     def get_note_at_position(self, time: float, pitch: int, tolerance: float = 0.1) -> Optional[int]:
         """获取指定位置和音高的音符索引"""
-        for i, note in enumerate(self.notes):
-            if (abs(note.pitch - pitch) <= 1 and
-                note.start_time <= time <= note.start_time + note.duration + tolerance):
-                return i
-        return None
+        if self._index is None or not self._is_current(self._index[-1]):
+            self._build_index()
+        starts, ends, pitches, order, max_duration, _ = self._index
+        
+        # 只有开始时间在 [time - 最长时值 - 容差, time] 内的音符才可能命中
+        lo = np.searchsorted(starts, time - max_duration - tolerance, side='left')
+        hi = np.searchsorted(starts, time, side='right')
+        if lo >= hi:
+            return None
+        
+        # 首次命中测试时才加载（可能触发 numba 编译）
+        from ._hit_kernels import hit_test, NUMBA_AVAILABLE
+        if NUMBA_AVAILABLE:
+            index = hit_test(starts, ends, pitches, order, lo, hi,
+                             float(time), int(pitch), float(tolerance))
+            return int(index) if index >= 0 else None
+        
+        hits = (np.abs(pitches[lo:hi] - pitch) <= 1) & (ends[lo:hi] + tolerance >= time)
+        if not hits.any():
+            return None
+        # 与线性扫描一致：返回列表中最靠前的命中音符
+        return int(order[lo:hi][hits].min())
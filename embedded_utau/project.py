@@ -1,11 +1,112 @@
 # embedded_utau/project.py
+import gzip
+import hashlib
 import json
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
 from pathlib import Path
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 from typing import List, Dict, Optional
-from .note import Note, Track
+from .note import Note, Track, _SLOTS
+from .utils import user_cache_dir
 
-@dataclass
+try:
+    import orjson
+    
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    
+    _loads = json.loads
+
+# 音符在项目文件中保存的字段
+_NOTE_FIELDS = tuple(f.name for f in fields(Note))
+_get_note_fields = attrgetter(*_NOTE_FIELDS)
+
+# 项目快照缓存格式版本，结构变化时递增
+_CACHE_VERSION = 2
+# 快照缓存目录的大小上限，超出后按最近使用时间淘汰
+_PROJECT_CACHE_MAX_BYTES = 64 * 1024 ** 2
+
+# 快照写入线程（单线程依次写入；解释器退出前会等待未完成的写入）
+_cache_writer: Optional[ThreadPoolExecutor] = None
+
+# JSON 往返后得到的内置类型
+_JSON_TYPES = (str, int, float, bool, type(None))
+
+
+def _json_value(value):
+    """转换为 JSON 保存再读取后得到的内置类型（numpy 标量等 -> int/float/str/bool）"""
+    if type(value) in _JSON_TYPES:
+        return value
+    if hasattr(value, 'item'):
+        return value.item()
+    for json_type in (bool, int, float, str):
+        if isinstance(value, json_type):
+            return json_type(value)
+    return value
+
+
+def _project_cache_path(filepath: Path) -> Path:
+    """项目快照缓存位置（按项目文件绝对路径区分，存放在用户缓存目录中）"""
+    key = hashlib.blake2b(str(Path(filepath).resolve()).encode('utf-8'), digest_size=16).hexdigest()
+    return user_cache_dir() / 'projects' / f"{key}.pkl.gz"
+
+
+def _write_project_cache(cache_path: Path, stamp, snapshot):
+    """写入 gzip 压缩的项目快照（先写临时文件再替换，避免读到半个文件）"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = pickle.dumps((_CACHE_VERSION, stamp, snapshot), protocol=pickle.HIGHEST_PROTOCOL)
+        with tempfile.NamedTemporaryFile(dir=cache_path.parent, suffix='.tmp', delete=False) as f:
+            f.write(gzip.compress(payload, compresslevel=1))
+        os.replace(f.name, cache_path)
+    except OSError as e:
+        print(f"写入项目缓存失败: {e}")
+        return
+    _evict_project_cache(cache_path.parent, _PROJECT_CACHE_MAX_BYTES, keep=cache_path)
+
+
+def _evict_project_cache(cache_dir: Path, max_bytes: int, keep: Path):
+    """快照缓存总大小超过上限时，删除最久未使用的快照"""
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.pkl.gz'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+    except OSError:
+        return
+    
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+
+
+def _submit_cache_write(*args):
+    """交给单个后台线程写入快照，连续保存时不会各开一个线程"""
+    global _cache_writer
+    if _cache_writer is None:
+        _cache_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='project-cache')
+    _cache_writer.submit(_write_project_cache, *args)
+
+@dataclass(**_SLOTS)
 class ProjectSettings:
     """项目设置"""
     tempo: float = 120.0
@@ -23,6 +124,7 @@ class Project:
         self.tracks: List[Track] = []
         self.current_track_index = 0
         self.original_file_path: Optional[Path] = None  # 新增：原始文件路径
+        self._track_by_name: Optional[Dict[str, Track]] = None  # 名称 -> 音轨（同名取第一个）
     
     def add_track(self, name: str, voice_library_path: str = ""):
         """添加音轨"""
@@ -31,6 +133,8 @@ class Project:
         
         track = Track(name, voice_library_path)
         self.tracks.append(track)
+        if self._track_by_name is not None:
+            self._track_by_name.setdefault(name, track)
         return track
     def import_ust(self, file_path: Path) -> bool:
         """从 UST 文件导入"""
@@ -43,6 +147,7 @@ class Project:
             self.name = imported_project.name
             self.settings = imported_project.settings
             self.tracks = imported_project.tracks
+            self._track_by_name = None
             self.original_file_path = file_path
             
             return True
@@ -63,6 +168,9 @@ class Project:
     def remove_track(self, index: int):
         """移除音轨"""
         if 0 <= index < len(self.tracks):
+            removed = self.tracks[index]
+            if self._track_by_name is not None and self._track_by_name.get(removed.name) is removed:
+                del self._track_by_name[removed.name]
             del self.tracks[index]
             if self.current_track_index >= len(self.tracks):
                 self.current_track_index = max(0, len(self.tracks) - 1)
@@ -80,10 +188,14 @@ class Project:
     
     def get_track_by_name(self, name: str) -> Optional[Track]:
         """根据名称获取音轨"""
-        for track in self.tracks:
-            if track.name == name:
-                return track
-        return None
+        track = self._track_by_name.get(name) if self._track_by_name is not None else None
+        if track is None or track.name != name:
+            # 索引未建立、音轨被改名或删除了同名音轨中的第一个时重建
+            self._track_by_name = {}
+            for t in self.tracks:
+                self._track_by_name.setdefault(t.name, t)
+            track = self._track_by_name.get(name)
+        return track
     
     def save_project(self, filepath: Path):
         """保存项目到文件"""
@@ -95,14 +207,7 @@ class Project:
                     'name': track.name,
                     'voice_library_path': track.voice_library_path,
                     'notes': [
-                        {
-                            'lyric': note.lyric,
-                            'pitch': note.pitch,
-                            'start_time': note.start_time,
-                            'duration': note.duration,
-                            'velocity': note.velocity,
-                            'flags': note.flags
-                        }
+                        dict(zip(_NOTE_FIELDS, _get_note_fields(note)))
                         for note in track.notes
                     ]
                 }
@@ -110,17 +215,61 @@ class Project:
             ]
         }
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(project_data, f, indent=2, ensure_ascii=False)
+        # 安装 orjson 时使用 orjson 序列化，否则退回标准库 json
+        filepath = Path(filepath)
+        filepath.write_bytes(_dumps(project_data))
+        
+        # 在后台写入快照缓存，下次打开时跳过 JSON 解析；
+        # 字段统一为 JSON 读取后的内置类型，两种加载路径得到的项目一致
+        stat = filepath.stat()
+        snapshot = (
+            _json_value(self.name),
+            {key: _json_value(value) for key, value in project_data['settings'].items()},
+            [(_json_value(track.name), _json_value(track.voice_library_path),
+              [tuple(map(_json_value, _get_note_fields(note))) for note in track.notes])
+             for track in self.tracks],
+        )
+        _submit_cache_write(_project_cache_path(filepath), (stat.st_size, stat.st_mtime_ns), snapshot)
+    
+    def _load_project_cache(self, filepath: Path) -> bool:
+        """项目文件未变化时从快照缓存加载，成功返回 True"""
+        try:
+            stat = filepath.stat()
+            cache_path = _project_cache_path(filepath)
+            payload = cache_path.read_bytes()
+            version, stamp, snapshot = pickle.loads(gzip.decompress(payload))
+        except Exception:
+            return False
+        if version != _CACHE_VERSION or stamp != (stat.st_size, stat.st_mtime_ns):
+            return False
+        try:
+            os.utime(cache_path)  # 更新最近使用时间，供淘汰使用
+        except OSError:
+            pass
+        
+        name, settings, tracks = snapshot
+        self.name = name
+        self.settings = ProjectSettings(**settings)
+        self.tracks.clear()
+        self._track_by_name = None
+        for track_name, voice_library_path, notes in tracks:
+            track = Track(track_name, voice_library_path)
+            track.notes.extend(Note(*fields) for fields in notes)
+            self.tracks.append(track)
+        return True
     
     def load_project(self, filepath: Path):
         """从文件加载项目"""
-        with open(filepath, 'r', encoding='utf-8') as f:
-            project_data = json.load(f)
+        filepath = Path(filepath)
+        if self._load_project_cache(filepath):
+            return
+        
+        project_data = _loads(filepath.read_bytes())
         
         self.name = project_data['name']
         self.settings = ProjectSettings(**project_data['settings'])
         self.tracks.clear()
+        self._track_by_name = None
         
         for track_data in project_data['tracks']:
             track = Track(track_data['name'], track_data['voice_library_path'])
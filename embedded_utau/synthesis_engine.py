@@ -1,31 +1,228 @@
 # embedded_utau/synthesis_engine.py
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from functools import lru_cache
 import numpy as np
 from pathlib import Path
 import scipy.signal as signal
+from scipy import fft as sp_fft
 from scipy.io import wavfile
 import librosa
 import logging
 from typing import Optional, Dict
 try:
-    from embedded_utau.voice_library import VoiceLibrary
+    import soundfile as sf
+except ImportError:
+    sf = None
+try:
+    from embedded_utau.voice_library import VoiceLibrary, VoiceSample
     from embedded_utau.note import Track
     from embedded_utau.project import Project
     from embedded_utau.library_adapter import LibraryAdapter
+    from embedded_utau.utils import user_cache_dir, process_pool_context
+    from embedded_utau._dsp_kernels import (
+        fir3_inplace, cos_envelope_inplace, soft_knee_compress, limit_inplace, KERNELS_AVAILABLE
+    )
 except ImportError:
-    from .voice_library import VoiceLibrary
+    from .voice_library import VoiceLibrary, VoiceSample
     from .note import Track
     from .project import Project
     from .library_adapter import LibraryAdapter
+    from .utils import user_cache_dir, process_pool_context
+    from ._dsp_kernels import (
+        fir3_inplace, cos_envelope_inplace, soft_knee_compress, limit_inplace, KERNELS_AVAILABLE
+    )
+
+# 音符磁盘缓存格式版本，音符处理链变化时递增以使旧缓存失效
+_NOTE_CACHE_VERSION = 3
+# 内存中保留的已合成音符数量
+_NOTE_MEMORY_CACHE_SIZE = 100
+# 音符磁盘缓存的大小上限，超出后按最近使用时间淘汰到上限的 80%（一次腾出较多空间，避免每次写入都扫描目录）
+_NOTE_DISK_CACHE_MAX_BYTES = 512 * 1024 ** 2
+_NOTE_DISK_CACHE_LOW_WATER = 0.8
+# 未命中缓存的音符达到该数量时才启用多进程合成（进程启动有固定开销）
+_PARALLEL_MIN_NOTES = 16
+
+# 工作进程内复用的合成引擎
+_worker_engine = None
+
+
+@lru_cache(maxsize=None)
+def _eq_sos(sample_rate):
+    """多段均衡器各频段的二阶节（SOS）系数，按采样率缓存"""
+    nyquist = sample_rate / 2
+    return {
+        # 低频增强 (80-300Hz)
+        'low': signal.butter(2, [80/nyquist, 300/nyquist], btype='band', output='sos'),
+        # 中频控制 (300-3000Hz)
+        'mid': signal.butter(2, [300/nyquist, 3000/nyquist], btype='band', output='sos'),
+        # 高频衰减 (3000Hz以上)
+        'high': signal.butter(2, 3000/nyquist, btype='high', output='sos'),
+    }
+
+
+@lru_cache(maxsize=64)
+def _fade_in_window(length):
+    """长度为 length 的线性淡入窗（只读，按长度缓存）"""
+    window = 1 - np.linspace(1, 0, length)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=None)
+def _edge_fades(length):
+    """样本预处理用的线性淡入/淡出窗（只读，按长度缓存）"""
+    fade_in = np.linspace(0, 1, length)
+    fade_out = np.linspace(1, 0, length)
+    fade_in.flags.writeable = False
+    fade_out.flags.writeable = False
+    return fade_in, fade_out
+
+
+@lru_cache(maxsize=8)
+def _hann_window(n_fft):
+    """周期 Hann 窗（只读，按长度缓存）"""
+    window = signal.get_window('hann', n_fft, fftbins=True)
+    window.flags.writeable = False
+    return window
+
+
+def _overlap_add(frames, hop):
+    """将 (帧数, n_fft) 的帧按 hop 重叠相加（n_fft 须为 hop 的整数倍）"""
+    n_frames, n_fft = frames.shape
+    overlap = n_fft // hop
+    chunks = frames.reshape(n_frames, overlap, hop)
+    out = np.zeros((n_frames + overlap - 1) * hop, dtype=frames.dtype)
+    for r in range(overlap):
+        out[r * hop:(r + n_frames) * hop] += chunks[:, r, :].reshape(-1)
+    return out
+
+
+def _phase_vocoder(x, rate, n_fft=2048, hop=512):
+    """基于 rfft 的相位声码器时间拉伸（rate > 1 变短），结果与 librosa.effects.time_stretch 一致
+    （float32 输入时只相差单精度舍入误差）
+    
+    相位累加用 cumsum 一次完成，不再逐帧循环；FFT 使用 scipy.fft 多线程计算
+    """
+    # float32 输入的 FFT 与幅度使用单精度计算；相位始终用双精度累加（单精度误差随长度增长）
+    window = _hann_window(n_fft).astype(x.dtype if x.dtype == np.float32 else np.float64, copy=False)
+    
+    # 居中分帧（两端补零）并做实数 FFT
+    frames = np.lib.stride_tricks.sliding_window_view(np.pad(x, n_fft // 2), n_fft)[::hop]
+    spec = sp_fft.rfft(frames * window, axis=-1, workers=-1)
+    n_frames, n_bins = spec.shape
+    
+    # 输出帧在输入时间轴上的位置；末尾补两帧零以简化边界
+    steps = np.arange(0, n_frames, rate, dtype=np.float64)
+    idx = steps.astype(np.int64)
+    alpha = (steps % 1.0)[:, None]
+    spec = np.concatenate([spec, np.zeros((2, n_bins), dtype=spec.dtype)])
+    magnitude = np.abs(spec)
+    phase = np.angle(spec).astype(np.float64, copy=False)
+    
+    # 幅度线性插值
+    out_mag = (1.0 - alpha) * magnitude[idx] + alpha * magnitude[idx + 1]
+    
+    # 相位增量：去除期望推进量后折叠到 [-pi, pi]，再累加得到每个输出帧的相位
+    phi_advance = np.linspace(0, np.pi * hop, n_bins)
+    dphase = phase[idx + 1] - phase[idx] - phi_advance
+    dphase -= 2.0 * np.pi * np.round(dphase / (2.0 * np.pi))
+    phase_acc = np.empty_like(dphase)
+    phase_acc[0] = phase[0]
+    np.cumsum(phi_advance + dphase[:-1], axis=0, out=phase_acc[1:])
+    phase_acc[1:] += phase[0]
+    
+    # 逆变换、加窗重叠相加并按窗平方和归一化
+    out_spec = np.empty(out_mag.shape, dtype=spec.dtype)
+    np.multiply(out_mag, np.cos(phase_acc), out=out_spec.real)
+    np.multiply(out_mag, np.sin(phase_acc), out=out_spec.imag)
+    stretched = sp_fft.irfft(out_spec, n=n_fft, axis=-1, workers=-1)
+    y = _overlap_add(stretched * window, hop)
+    norm = _overlap_add(np.broadcast_to(window ** 2, stretched.shape), hop)
+    nonzero = norm > np.finfo(norm.dtype).tiny
+    y[nonzero] /= norm[nonzero]
+    
+    # 去掉居中补零，并修正到目标长度
+    length = int(round(len(x) / rate))
+    y = y[n_fft // 2:n_fft // 2 + length]
+    if len(y) < length:
+        y = np.pad(y, (0, length - len(y)))
+    return y.astype(x.dtype, copy=False)
+
+
+def _evict_note_cache(cache_dir: Path, max_bytes: int, target_bytes: int) -> int:
+    """磁盘缓存超过上限时删除最久未使用的音符文件，直到不超过 target_bytes，返回剩余总大小"""
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('.npy'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return 0
+    
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return total
+    for _, size, path in sorted(entries):
+        if total <= target_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+    return total
+
+
+def _synth_group_worker(task):
+    """工作进程：合成共用同一样本和音高差的一组音符，返回 [(起始采样点, 音频), ...]
+    
+    只接收音符和样本的元数据，样本音频在工作进程中按需加载，避免传输大数组
+    """
+    global _worker_engine
+    items, sample_meta, sample_rate, pitch_res_type = task
+    if _worker_engine is None or _worker_engine.sample_rate != sample_rate:
+        _worker_engine = SynthesisEngine(sample_rate)
+    _worker_engine.pitch_res_type = pitch_res_type
+    file_path, pitch, lyric, sample_sr = sample_meta
+    sample = VoiceSample(file_path, pitch, lyric, sample_rate=sample_sr)
+    return _worker_engine._render_group(items, sample)
+
 
 class SynthesisEngine:
     """合成引擎"""
     
     def __init__(self, sample_rate=48000):
         self.sample_rate = sample_rate
+        _eq_sos(sample_rate)  # 预先设计均衡器滤波器
         self.voice_libraries: Dict[str, VoiceLibrary] = {}  # 路径 -> 音源库映射
         self.logger = self.setup_logger()
-        self.sample_cache: Dict[str, np.ndarray] = {}  # 样本缓存
+        self.sample_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()  # 音符缓存（LRU）
+        self.note_cache_dir = user_cache_dir() / 'notes'  # 音符磁盘缓存（.npy）
+        self._note_cache_bytes: Optional[int] = None  # 磁盘缓存总大小（首次写入时扫描目录得到）
         self.library_adapter = LibraryAdapter()
+        # 音高移动内核缓存：(半音数, n_fft, hop) -> 窗函数与重采样参数
+        self._pitch_kernels: Dict[tuple, dict] = {}
+        # 多相重采样 FIR 缓存：(up, down) -> 滤波器系数
+        self._poly_kernels: Dict[tuple, np.ndarray] = {}
+        # 音高移动重采样方式：默认 "polyphase"（scipy 多相 FIR，速度快），
+        # 需要更高质量时可改为 librosa 支持的 "soxr_hq" 等
+        self.pitch_res_type = 'polyphase'
+        # 音符并行合成的进程数，设为 1 则始终顺序合成
+        self.max_workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+        # 常驻进程池（首次并行合成时创建，各音轨复用，cleanup 时关闭）
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_workers = 0
     
     def load_voice_library(self, library_path: str) -> bool:
         """加载音源库到引擎"""
@@ -36,14 +233,14 @@ class SynthesisEngine:
                 
                 if voice_lib:
                     self.voice_libraries[library_path] = voice_lib
-                    print(f"成功加载音源库: {voice_lib.get_library_name()} - {message}")
+                    self.logger.info(f"成功加载音源库: {voice_lib.get_library_name()} - {message}")
                     return True
                 else:
-                    print(f"加载音源库失败 {library_path}: {message}")
+                    self.logger.warning(f"加载音源库失败 {library_path}: {message}")
                     return False
             return True
         except Exception as e:
-            print(f"加载音源库失败 {library_path}: {e}")
+            self.logger.error(f"加载音源库失败 {library_path}: {e}")
             return False
     
     def unload_voice_library(self, library_path: str):
@@ -57,37 +254,37 @@ class SynthesisEngine:
     
     def synthesize_project(self, project: Project) -> np.ndarray:
         """合成整个项目"""
-        print(f"开始合成项目 '{project.name}'，包含 {len(project.tracks)} 个音轨")
+        self.logger.info(f"开始合成项目 '{project.name}'，包含 {len(project.tracks)} 个音轨")
         
         # 计算项目总时长
         total_duration = project.settings.total_duration
         total_samples = int(total_duration * self.sample_rate)
-        master_output = np.zeros(total_samples)
+        master_output = np.zeros(total_samples, dtype=np.float32)
         
         # 处理每个音轨
         for i, track in enumerate(project.tracks):
             if track.muted:
-                print(f"跳过静音音轨: {track.name}")
+                self.logger.info(f"跳过静音音轨: {track.name}")
                 continue
             
             if track.solo and not any(t.solo for t in project.tracks if not t.muted):
                 # 如果有solo音轨，只处理solo音轨
                 continue
             
-            print(f"合成音轨 {i+1}/{len(project.tracks)}: {track.name}")
+            self.logger.info(f"合成音轨 {i+1}/{len(project.tracks)}: {track.name}")
             
             # 加载音轨的音源库
             if track.voice_library_path:
                 if not self.load_voice_library(track.voice_library_path):
-                    print(f"警告: 无法加载音轨 {track.name} 的音源库")
+                    self.logger.warning(f"无法加载音轨 {track.name} 的音源库")
                     continue
                 
                 voice_lib = self.get_voice_library(track.voice_library_path)
                 if not voice_lib:
-                    print(f"警告: 音轨 {track.name} 的音源库未找到")
+                    self.logger.warning(f"音轨 {track.name} 的音源库未找到")
                     continue
             else:
-                print(f"警告: 音轨 {track.name} 没有设置音源库")
+                self.logger.warning(f"音轨 {track.name} 没有设置音源库")
                 continue
             
             # 合成音轨
@@ -103,58 +300,128 @@ class SynthesisEngine:
         # 主输出处理
         master_output = self.master_processing(master_output)
         
-        print("项目合成完成")
+        self.logger.info("项目合成完成")
         return master_output
     
     def synthesize_track(self, track: Track, voice_library: VoiceLibrary) -> np.ndarray:
         """合成单个音轨"""
         if not track.notes:
-            print(f"音轨 {track.name} 没有音符")
-            return np.zeros(int(self.sample_rate * 10))  # 返回10秒静音
+            self.logger.info(f"音轨 {track.name} 没有音符")
+            return np.zeros(int(self.sample_rate * 10), dtype=np.float32)  # 返回10秒静音
         
         # 计算音轨时长
         track_duration = max((note.start_time + note.duration for note in track.notes), default=10)
-        track_samples = int(track_duration * self.sample_rate)
-        track_output = np.zeros(track_samples)
+        # 预留2秒余量（音高移动/拉伸可能使音符略长），避免混合时扩展数组
+        track_samples = int(track_duration * self.sample_rate) + int(2 * self.sample_rate)
+        track_output = np.zeros(track_samples, dtype=np.float32)
         
+        pending = []
+        debug = self.logger.isEnabledFor(logging.DEBUG)
         for i, note in enumerate(track.notes):
-            print(f"  合成音符 {i+1}/{len(track.notes)}: {note.lyric} 音高{note.pitch}")
+            if debug:
+                self.logger.debug(f"  合成音符 {i+1}/{len(track.notes)}: {note.lyric} 音高{note.pitch}")
+            elif i % 50 == 0:
+                # 逐音符输出开销不小，默认只每50个音符报告一次进度
+                self.logger.info(f"  合成音符 {i+1}/{len(track.notes)}")
             
             # 获取合适的样本
             sample = voice_library.get_best_sample(note.lyric, note.pitch)
             if sample:
-                # 合成音符
-                note_audio = self.synthesize_note_safe(note, sample)
-                
-                # 混合到音轨输出
-                start_sample = int(note.start_time * self.sample_rate)
-                end_sample = start_sample + len(note_audio)
-                
-                if end_sample <= len(track_output):
-                    track_output[start_sample:end_sample] += note_audio
-                else:
-                    # 如果超出范围，扩展输出数组
-                    extension = end_sample - len(track_output)
-                    track_output = np.pad(track_output, (0, extension), mode='constant')
-                    track_output[start_sample:end_sample] += note_audio
+                pending.append((int(note.start_time * self.sample_rate), note, sample))
+        
+        # 合成音符（各音符互相独立，可并行），再在主线程中混合
+        for start_sample, note_audio in self._render_notes(pending):
+            # 混合到音轨输出（超出余量的部分截断）
+            end_sample = min(start_sample + len(note_audio), len(track_output))
+            if end_sample > start_sample:
+                track_output[start_sample:end_sample] += note_audio[:end_sample - start_sample]
         
         return track_output
     
-    def apply_track_mix(self, audio_data: np.ndarray, volume: float, pan: float) -> np.ndarray:
-        """应用音轨混音设置（音量和声像）"""
-        # 应用音量
-        audio_data = audio_data * volume
+    def _render_notes(self, pending):
+        """合成 (起始采样点, 音符, 样本) 列表，返回 (起始采样点, 音频) 列表
+        
+        先查缓存；未命中的音符较多时交给进程池并行合成，失败则回退为顺序合成
+        """
+        rendered = []
+        # 未命中缓存的音符按 (样本, 音高差) 分组，同组只做一次预处理和音高移动
+        groups = defaultdict(list)
+        for start_sample, note, sample in pending:
+            semitones = note.pitch - sample.pitch
+            cache_key = self._note_cache_key(sample, semitones, int(note.duration * self.sample_rate))
+            cached = self._load_cached_note(cache_key)
+            if cached is not None:
+                rendered.append((start_sample, cached))
+            else:
+                # 带上缓存键，合成时不再重复查找
+                groups[(sample.file_path, semitones)].append((start_sample, note, cache_key, sample))
+        
+        n_misses = sum(len(group) for group in groups.values())
+        if n_misses >= _PARALLEL_MIN_NOTES and len(groups) > 1 and self.max_workers > 1:
+            tasks = [
+                ([item[:3] for item in group],
+                 (group[0][3].file_path, group[0][3].pitch, group[0][3].lyric, group[0][3].sample_rate),
+                 self.sample_rate, self.pitch_res_type)
+                for group in groups.values()
+            ]
+            try:
+                # 每个任务已是一组音符，逐组分发；工作进程会写入磁盘缓存，下次合成时直接命中
+                results = list(self._get_executor().map(_synth_group_worker, tasks))
+                for group_results in results:
+                    rendered.extend(group_results)
+                # 工作进程各自写入了磁盘缓存，重新统计并按上限淘汰
+                self._note_cache_bytes = None
+                self._account_note_cache(0)
+                return rendered
+            except Exception as e:
+                self.logger.warning(f"并行合成失败，改为顺序合成: {e}")
+                # 进程池可能已损坏，下次重新创建
+                self.cleanup()
+        
+        for group in groups.values():
+            rendered.extend(self._render_group([item[:3] for item in group], group[0][3]))
+        return rendered
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """获取常驻进程池，进程数设置变化时重建（工作进程不通过 fork 启动，见 process_pool_context）"""
+        if self._executor is None or self._executor_workers != self.max_workers:
+            self.cleanup()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=process_pool_context()
+            )
+            self._executor_workers = self.max_workers
+        return self._executor
+    
+    def cleanup(self):
+        """关闭常驻进程池（不等待工作进程退出）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def _render_group(self, items, sample):
+        """合成共用同一样本和音高差的一组 (起始采样点, 音符, 缓存键)（均为已确认未命中缓存的音符）
         
+        预处理和音高移动只做一次，组内每个音符只需时间拉伸和包络
+        """
+        semitones = items[0][1].pitch - sample.pitch
+        try:
+            source = self._prepare_source(sample, semitones)
+        except Exception as e:
+            self.logger.error(f"准备样本失败: {e}")
+            source = None
+        return [(start_sample, self.synthesize_note_safe(note, sample, source, cache_key))
+                for start_sample, note, cache_key in items]
+    
+    def apply_track_mix(self, audio_data: np.ndarray, volume: float, pan: float) -> np.ndarray:
+        """应用音轨混音设置（音量和声像），原地修改 audio_data"""
         # 应用声像（简单的立体声平衡）
-        if len(audio_data) > 0:
-            # 创建立体声（目前还是单声道，但为未来扩展准备）
-            left_gain = 1.0 if pan <= 0 else 1.0 - pan
-            right_gain = 1.0 if pan >= 0 else 1.0 + pan
-            
-            # 目前还是返回单声道，但应用平衡
-            balanced_mono = audio_data * (left_gain + right_gain) / 2
-            return balanced_mono
+        # 创建立体声（目前还是单声道，但为未来扩展准备）
+        left_gain = 1.0 if pan <= 0 else 1.0 - pan
+        right_gain = 1.0 if pan >= 0 else 1.0 + pan
         
+        # 目前还是返回单声道：音量与平衡合并为一个增益，一次乘完
+        gain = volume * (left_gain + right_gain) / 2
+        np.multiply(audio_data, gain, out=audio_data)
         return audio_data
     
     def master_processing(self, audio_data: np.ndarray) -> np.ndarray:
@@ -162,7 +429,7 @@ class SynthesisEngine:
         if len(audio_data) == 0:
             return audio_data
         
-        print("应用主输出处理...")
+        self.logger.info("应用主输出处理...")
         
         try:
             # 1. 移除DC偏移
@@ -183,40 +450,118 @@ class SynthesisEngine:
                 target_level = 0.9  # 留出余量
                 audio_data = audio_data / max_val * target_level
             
-            print("主输出处理完成")
+            self.logger.info("主输出处理完成")
             return audio_data
             
         except Exception as e:
-            print(f"主输出处理失败: {e}")
+            self.logger.error(f"主输出处理失败: {e}")
             return audio_data
     
-    def synthesize_note_safe(self, note, sample):
-        """安全的音符合成-带缓存"""
-        cache_key = f"{sample.file_path}_{note.pitch}_{note.duration}"
-        
-        if cache_key in self.sample_cache:
-            return self.sample_cache[cache_key].copy()
+    def _note_cache_key(self, sample, semitones, target_samples) -> str:
+        """音符缓存键：样本文件及其修改时间、音高差、目标长度、采样率"""
         try:
-            # 加载样本
-            sample.load_sample()
-            
-            # 检查样本数据
-            if sample.sample_data is None or len(sample.sample_data) == 0:
-                print(f"警告: 样本数据为空，使用静音")
-                return np.zeros(int(note.duration * self.sample_rate))
-            
-            # 预处理样本
-            audio_data = self.preprocess_sample(sample.sample_data)
-            
-            # 应用音高移动
-            semitones = note.pitch - sample.pitch
-            if abs(semitones) > 0.5:  # 只在实际需要时移动音高
-                print(f"  音高移动: {semitones} 半音")
-                audio_data = self.safe_pitch_shift(audio_data, semitones)
+            mtime = os.path.getmtime(sample.file_path)
+        except OSError:
+            mtime = 0
+        raw = (
+            f"{_NOTE_CACHE_VERSION}|{sample.file_path}|{mtime}|{semitones}|"
+            f"{target_samples}|{self.sample_rate}|{self.pitch_res_type}"
+        )
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _remember_note(self, cache_key, audio_data):
+        """放入内存 LRU 缓存"""
+        self.sample_cache[cache_key] = audio_data
+        self.sample_cache.move_to_end(cache_key)
+        if len(self.sample_cache) > _NOTE_MEMORY_CACHE_SIZE:
+            self.sample_cache.popitem(last=False)
+    
+    def _load_cached_note(self, cache_key) -> Optional[np.ndarray]:
+        """依次查找内存缓存和磁盘缓存，未命中返回 None"""
+        audio_data = self.sample_cache.get(cache_key)
+        if audio_data is not None:
+            self.sample_cache.move_to_end(cache_key)
+            return audio_data.copy()
+        
+        path = self.note_cache_dir / f"{cache_key}.npy"
+        try:
+            cached = np.load(path, mmap_mode='r')
+            os.utime(path)  # 更新最近使用时间，供淘汰使用
+        except (OSError, ValueError):
+            return None
+        audio_data = np.array(cached, dtype=np.float32)
+        self._remember_note(cache_key, audio_data)
+        return audio_data.copy()
+    
+    def _store_cached_note(self, cache_key, audio_data):
+        """写入内存缓存和磁盘缓存（float32 .npy，先写临时文件再替换）"""
+        self._remember_note(cache_key, audio_data.copy())
+        try:
+            self.note_cache_dir.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=self.note_cache_dir, suffix='.tmp', delete=False) as f:
+                np.save(f, audio_data.astype(np.float32))
+                nbytes = f.tell()
+            os.replace(f.name, self.note_cache_dir / f"{cache_key}.npy")
+        except OSError as e:
+            self.logger.warning(f"写入音符缓存失败: {e}")
+            return
+        self._account_note_cache(nbytes)
+    
+    def _account_note_cache(self, nbytes):
+        """累计磁盘缓存大小，超过上限时按最近使用时间淘汰"""
+        if self._note_cache_bytes is not None:
+            self._note_cache_bytes += nbytes
+            if self._note_cache_bytes <= _NOTE_DISK_CACHE_MAX_BYTES:
+                return
+        self._note_cache_bytes = _evict_note_cache(
+            self.note_cache_dir, _NOTE_DISK_CACHE_MAX_BYTES,
+            int(_NOTE_DISK_CACHE_MAX_BYTES * _NOTE_DISK_CACHE_LOW_WATER)
+        )
+    
+    def _prepare_source(self, sample, semitones) -> Optional[np.ndarray]:
+        """加载样本、预处理并移调，返回只读数组（样本为空时返回 None）"""
+        # 加载样本
+        sample.load_sample()
+        
+        # 检查样本数据
+        if sample.sample_data is None or len(sample.sample_data) == 0:
+            self.logger.warning("样本数据为空，使用静音")
+            return None
+        
+        # 预处理样本
+        audio_data = self.preprocess_sample(sample.sample_data)
+        
+        # 应用音高移动
+        if abs(semitones) > 0.5:  # 只在实际需要时移动音高
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"  音高移动: {semitones} 半音")
+            audio_data = self.safe_pitch_shift(audio_data, semitones)
+        
+        # 同组音符共享，后续步骤不得原地修改
+        audio_data.flags.writeable = False
+        return audio_data
+    
+    def synthesize_note_safe(self, note, sample, source=None, cache_key=None):
+        """安全的音符合成-带缓存（内存 LRU + 磁盘）
+        
+        source 为同组音符共享的已预处理、已移调样本（见 _prepare_source），省略时现场计算；
+        cache_key 由已查过缓存的调用方传入，此时跳过缓存查找直接合成
+        """
+        semitones = note.pitch - sample.pitch
+        target_samples = int(note.duration * self.sample_rate)
+        if cache_key is None:
+            cache_key = self._note_cache_key(sample, semitones, target_samples)
+            cached = self._load_cached_note(cache_key)
+            if cached is not None:
+                return cached
+        try:
+            if source is None:
+                source = self._prepare_source(sample, semitones)
+                if source is None:
+                    return np.zeros(int(note.duration * self.sample_rate), dtype=np.float32)
             
             # 调整持续时间
-            target_samples = int(note.duration * self.sample_rate)
-            audio_data = self.time_stretch_safe(audio_data, target_samples)
+            audio_data = self.time_stretch_safe(source, target_samples)
             
             # 应用包络
             audio_data = self.apply_note_envelope(audio_data)
@@ -224,36 +569,34 @@ class SynthesisEngine:
             # 最终安全检查
             audio_data = self.final_safety_check(audio_data)
             
-            # 缓存结果（限制缓存大小）
-            if len(self.sample_cache) > 100:
-                self.sample_cache.pop(next(iter(self.sample_cache)))
-            self.sample_cache[cache_key] = audio_data.copy()
+            # 缓存结果
+            self._store_cached_note(cache_key, audio_data)
             
             return audio_data
             
         except Exception as e:
             self.logger.error(f"合成音符失败: {e}")
-            return np.zeros(int(note.duration * self.sample_rate))
+            return np.zeros(int(note.duration * self.sample_rate), dtype=np.float32)
     
     def preprocess_sample(self, audio_data):
-        """预处理样本数据"""
-        # 移除DC偏移
-        audio_data = audio_data - np.mean(audio_data)
+        """预处理样本数据（只分配一个输出数组，其余步骤原地完成）"""
+        # 移除DC偏移（同时复制，不修改样本缓存的数据）
+        audio_data = np.subtract(audio_data, np.mean(audio_data))
         
-        # 应用轻微的淡入淡出避免咔嗒声
+        # 应用轻微的淡入淡出避免咔嗒声（淡入淡出窗按长度缓存）
         fade_samples = min(100, len(audio_data) // 10)
         if fade_samples > 0:
-            fade_in = np.linspace(0, 1, fade_samples)
-            fade_out = np.linspace(1, 0, fade_samples)
+            fade_in, fade_out = _edge_fades(fade_samples)
             audio_data[:fade_samples] *= fade_in
             audio_data[-fade_samples:] *= fade_out
         
         # 轻微压缩避免过载
-        threshold = 0.8
         compression_ratio = 1.5
-        compressed = np.tanh(audio_data * compression_ratio) / compression_ratio
+        audio_data *= compression_ratio
+        np.tanh(audio_data, out=audio_data)
+        audio_data /= compression_ratio
         
-        return compressed
+        return audio_data
     
     def safe_pitch_shift(self, audio_data, semitones):
         """安全的音高移动"""
@@ -275,25 +618,73 @@ class SynthesisEngine:
                 hop_length = 256
             
             if len(audio_data) < n_fft:
-                print(f"  音频过短 ({len(audio_data)} 样本)，跳过音高移动")
+                self.logger.debug(f"  音频过短 ({len(audio_data)} 样本)，跳过音高移动")
                 return audio_data
             
-            # 使用librosa进行音高移动
-            shifted = librosa.effects.pitch_shift(
-                y=audio_data,
-                sr=self.sample_rate,
-                n_steps=semitones,
-                n_fft=n_fft,
-                hop_length=hop_length,
-                bins_per_octave=12
-            )
-            
-            return shifted
+            kernel = self._get_shift_kernel(semitones, n_fft, hop_length)
+            return self._apply_shift(kernel, audio_data)
             
         except Exception as e:
-            print(f"音高移动失败: {e}")
+            self.logger.warning(f"音高移动失败: {e}")
             return audio_data
     
+    def _get_shift_kernel(self, semitones, n_fft, hop_length):
+        """获取音高移动内核（窗函数、拉伸比例、重采样参数），按参数缓存"""
+        key = (semitones, n_fft, hop_length)
+        kernel = self._pitch_kernels.get(key)
+        if kernel is None:
+            rate = 2.0 ** (-semitones / 12)
+            kernel = {
+                'n_fft': n_fft,
+                'hop_length': hop_length,
+                'rate': rate,
+                'window': librosa.filters.get_window('hann', n_fft, fftbins=True),
+                'orig_sr': float(self.sample_rate) / rate,
+                # 多相重采样的有理数近似比例
+                'poly_ratio': Fraction(rate).limit_denominator(1000).as_integer_ratio(),
+            }
+            self._pitch_kernels[key] = kernel
+        return kernel
+    
+    def _apply_shift(self, kernel, y):
+        """应用音高移动：STFT -> 相位声码器时间拉伸 -> ISTFT -> 重采样"""
+        n_fft = kernel['n_fft']
+        hop_length = kernel['hop_length']
+        window = kernel['window']
+        
+        stft = librosa.stft(y, n_fft=n_fft, hop_length=hop_length, window=window)
+        stft = librosa.phase_vocoder(stft, rate=kernel['rate'], hop_length=hop_length, n_fft=n_fft)
+        stretched = librosa.istft(
+            stft,
+            hop_length=hop_length,
+            n_fft=n_fft,
+            window=window,
+            dtype=y.dtype,
+            length=int(round(len(y) / kernel['rate']))
+        )
+        
+        if self.pitch_res_type == 'polyphase':
+            up, down = kernel['poly_ratio']
+            shifted = signal.resample_poly(stretched, up, down, window=self._get_poly_kernel(up, down))
+        else:
+            shifted = librosa.resample(
+                stretched,
+                orig_sr=kernel['orig_sr'],
+                target_sr=self.sample_rate,
+                res_type=self.pitch_res_type
+            )
+        return librosa.util.fix_length(shifted, size=len(y))
+    
+    def _get_poly_kernel(self, up, down):
+        """获取多相重采样的低通 FIR（与 resample_poly 默认设计相同），按比例缓存"""
+        fir = self._poly_kernels.get((up, down))
+        if fir is None:
+            max_rate = max(up, down)
+            fir = signal.firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+            fir = fir.astype(np.float32)
+            self._poly_kernels[(up, down)] = fir
+        return fir
+    
     def time_stretch_safe(self, audio_data, target_samples):
         """安全的时间拉伸"""
         current_samples = len(audio_data)
@@ -307,10 +698,7 @@ class SynthesisEngine:
         if 0.5 <= ratio <= 2.0:
             # 使用相位声码器进行高质量时间拉伸
             try:
-                stretched = librosa.effects.time_stretch(
-                    y=audio_data,
-                    rate=1/ratio
-                )
+                stretched = _phase_vocoder(audio_data, 1/ratio)
                 
                 # 确保长度正确
                 if len(stretched) > target_samples:
@@ -321,7 +709,7 @@ class SynthesisEngine:
                     return stretched
                     
             except Exception as e:
-                print(f"时间拉伸失败: {e}, 使用简单方法")
+                self.logger.warning(f"时间拉伸失败: {e}, 使用简单方法")
         
         # 后备方法：交叉淡化重复
         return self.crossfade_repeat(audio_data, target_samples)
@@ -339,42 +727,24 @@ class SynthesisEngine:
                 shortened[-fade_out_len:] *= fade_out
             return shortened
         
-        # 延长 - 使用重叠相加
-        result = np.zeros(target_samples)
-        pos = 0
+        if current_samples == 0:
+            return np.zeros(target_samples, dtype=np.float32)
         
-        while pos < target_samples:
-            # 计算这次复制的长度
-            copy_len = min(current_samples, target_samples - pos)
-            
-            if pos == 0:
-                # 第一次复制，不需要交叉淡化
-                result[:copy_len] = audio_data[:copy_len]
-            else:
-                # 后续复制，应用交叉淡化
-                overlap_len = min(256, current_samples // 4, pos, copy_len)
-                
-                if overlap_len > 0:
-                    # 交叉淡化区域
-                    fade_out = np.linspace(1, 0, overlap_len)
-                    fade_in = 1 - fade_out
-                    
-                    # 应用交叉淡化
-                    result[pos:pos+overlap_len] = (
-                        result[pos:pos+overlap_len] * fade_out + 
-                        audio_data[:overlap_len] * fade_in
-                    )
-                    
-                    # 复制剩余部分
-                    if copy_len > overlap_len:
-                        result[pos+overlap_len:pos+copy_len] = audio_data[overlap_len:copy_len]
-                else:
-                    # 没有重叠，直接复制
-                    result[pos:pos+copy_len] = audio_data[:copy_len]
+        # 延长 - 平铺重复，每次重复的开头淡入
+        n_copies = -(-target_samples // current_samples)
+        tiled = np.empty((n_copies, current_samples), dtype=np.float32)
+        tiled[:] = audio_data
+        
+        overlap_len = min(256, current_samples // 4)
+        if overlap_len > 0 and n_copies > 1:
+            tiled[1:, :overlap_len] *= _fade_in_window(overlap_len)
             
-            pos += copy_len
+            # 最后一次重复不足淡入长度时，按剩余长度淡入
+            last_len = target_samples - (n_copies - 1) * current_samples
+            if last_len < overlap_len:
+                tiled[-1, :last_len] = audio_data[:last_len] * _fade_in_window(last_len)
         
-        return result
+        return tiled.reshape(-1)[:target_samples]
     
     def apply_note_envelope(self, audio_data):
         """应用音符包络"""
@@ -382,12 +752,18 @@ class SynthesisEngine:
         if length < 10:
             return audio_data
         
-        envelope = np.ones(length)
-        
         # 使用更长的淡入淡出时间
         attack_len = min(int(0.15 * length), 1500)   # 15% 或最多1500样本
         release_len = min(int(0.35 * length), 3500)  # 35% 或最多3500样本
         
+        if KERNELS_AVAILABLE:
+            # 单次遍历原地应用包络，不构造包络数组
+            audio_data = np.array(audio_data, dtype=np.float32)
+            cos_envelope_inplace(audio_data, attack_len, release_len)
+            return audio_data
+        
+        envelope = np.ones(length, dtype=np.float32)
+        
         # 使用更平滑的曲线
         if attack_len > 0:
             t = np.linspace(0, 1, attack_len)
@@ -411,39 +787,35 @@ class SynthesisEngine:
         
         # 应用轻微的平滑
         if len(audio_data) > 3:
-            audio_data[1:-1] = 0.25 * audio_data[:-2] + 0.5 * audio_data[1:-1] + 0.25 * audio_data[2:]
+            if KERNELS_AVAILABLE:
+                fir3_inplace(audio_data)
+            else:
+                audio_data[1:-1] = 0.25 * audio_data[:-2] + 0.5 * audio_data[1:-1] + 0.25 * audio_data[2:]
         
         return audio_data
     
     def multiband_eq(self, audio_data):
         """多段均衡器"""
         try:
-            # 设计多个频段的滤波器
-            nyquist = self.sample_rate / 2
-            
-            # 低频增强 (80-300Hz)
-            b_low, a_low = signal.butter(2, [80/nyquist, 300/nyquist], btype='band')
-            low_band = signal.filtfilt(b_low, a_low, audio_data)
-            
-            # 中频控制 (300-3000Hz)
-            b_mid, a_mid = signal.butter(2, [300/nyquist, 3000/nyquist], btype='band')
-            mid_band = signal.filtfilt(b_mid, a_mid, audio_data)
+            # 滤波器系数按采样率缓存，不再每次重新设计
+            sos = _eq_sos(self.sample_rate)
             
-            # 高频衰减 (3000Hz以上)
-            b_high, a_high = signal.butter(2, 3000/nyquist, btype='high')
-            high_band = signal.filtfilt(b_high, a_high, audio_data)
+            # 零相位滤波（二阶节形式数值更稳定）
+            low_band = signal.sosfiltfilt(sos['low'], audio_data)
+            mid_band = signal.sosfiltfilt(sos['mid'], audio_data)
+            high_band = signal.sosfiltfilt(sos['high'], audio_data)
             
-            # 混合各频段
+            # 混合各频段（滤波在双精度下进行，结果转回输入精度）
             result = (
                 1.2 * low_band +    # 低频增强20%
                 1.0 * mid_band +    # 中频保持
                 0.7 * high_band     # 高频衰减30%
-            )
+            ).astype(audio_data.dtype, copy=False)
             
             return result
             
         except Exception as e:
-            print(f"均衡器失败: {e}")
+            self.logger.error(f"均衡器失败: {e}")
             return audio_data
     
     def advanced_compression(self, audio_data):
@@ -453,35 +825,22 @@ class SynthesisEngine:
         ratio = 2.0
         knee_width = 0.1
         
-        compressed = audio_data.copy()
+        if KERNELS_AVAILABLE:
+            # 单次遍历完成全部计算
+            compressed = np.empty_like(audio_data)
+            soft_knee_compress(audio_data, compressed, threshold, ratio, knee_width)
+            return compressed
         
-        # 计算每个样本的增益减少
-        above_threshold = np.abs(audio_data) > threshold - knee_width/2
+        # 超出膝部起点的幅度
+        abs_x = np.abs(audio_data)
+        excess = np.maximum(abs_x - (threshold - knee_width/2), 0.0)
         
-        if np.any(above_threshold):
-            # 软膝压缩
-            excess = np.abs(audio_data[above_threshold]) - (threshold - knee_width/2)
-            excess = np.maximum(0, excess)
-            
-            # 在膝部区域内线性过渡
-            in_knee = excess < knee_width
-            if np.any(in_knee):
-                # 膝部区域：从1:1过渡到设定的压缩比
-                knee_ratio = 1 + (ratio - 1) * excess[in_knee] / knee_width
-                gain_reduction = excess[in_knee] * (1 - 1/knee_ratio)
-                compressed[above_threshold][in_knee] = (
-                    np.sign(audio_data[above_threshold][in_knee]) * 
-                    (threshold - knee_width/2 + excess[in_knee] - gain_reduction)
-                )
-            
-            # 膝部以上：完全压缩
-            above_knee = ~in_knee
-            if np.any(above_knee):
-                gain_reduction = excess[above_knee] * (1 - 1/ratio)
-                compressed[above_threshold][above_knee] = (
-                    np.sign(audio_data[above_threshold][above_knee]) * 
-                    (threshold - knee_width/2 + excess[above_knee] - gain_reduction)
-                )
+        # 膝部区域内从1:1线性过渡到设定的压缩比，膝部以上完全压缩
+        knee_t = np.clip(excess / knee_width, 0.0, 1.0)
+        effective_ratio = 1 + (ratio - 1) * knee_t
+        gain_reduction = excess * (1 - 1/effective_ratio)
+        
+        compressed = np.sign(audio_data) * (abs_x - gain_reduction)
         
         return compressed
     
@@ -489,34 +848,48 @@ class SynthesisEngine:
         """限制器 - 防止过载"""
         threshold = 0.9
         
-        # 简单的峰值限制
-        peaks = np.abs(audio_data)
-        over_threshold = peaks > threshold
+        if KERNELS_AVAILABLE:
+            limit_inplace(audio_data, threshold)
+            return audio_data
         
-        if np.any(over_threshold):
-            # 计算需要的增益减少
-            reduction = peaks[over_threshold] / threshold
-            audio_data[over_threshold] = audio_data[over_threshold] / reduction
+        # 简单的峰值限制：增益 = 阈值 / max(|x|, 阈值)，阈值以下增益为1
+        gain = np.abs(audio_data)
+        np.maximum(gain, threshold, out=gain)
+        np.divide(threshold, gain, out=gain)
+        np.multiply(audio_data, gain, out=audio_data)
         
         return audio_data
     
+    @staticmethod
+    def to_pcm16(audio_data):
+        """将浮点音频量化为16位PCM（已是 int16 时原样返回）"""
+        if audio_data.dtype == np.int16:
+            return audio_data
+        # 最终安全检查（nan_to_num 返回副本，不会修改调用方的缓存数据）
+        audio_data = np.nan_to_num(audio_data)
+        audio_data *= 32767.0
+        np.clip(audio_data, -32768, 32767, out=audio_data)
+        return audio_data.astype(np.int16)
+    
     def export_audio(self, audio_data, filepath):
         """导出音频文件"""
         try:
-            # 最终安全检查
-            audio_data = np.nan_to_num(audio_data)
-            audio_data = np.clip(audio_data, -1.0, 1.0)
-            
-            # 转换为16位PCM
-            audio_int16 = (audio_data * 32767).astype(np.int16)
-            
-            # 保存为WAV
-            wavfile.write(filepath, self.sample_rate, audio_int16)
-            print(f"音频已成功导出: {filepath}")
+            if sf is not None:
+                # 浮点数据以 float32 交给 libsndfile 直接量化为16位PCM，不再生成 int16 中间数组；
+                # 传入已量化的 int16 缓冲区时原样写出
+                if audio_data.dtype != np.int16:
+                    audio_data = audio_data.astype(np.float32)
+                    np.nan_to_num(audio_data, copy=False)
+                    np.clip(audio_data, -1.0, 1.0, out=audio_data)
+                sf.write(str(filepath), audio_data, self.sample_rate, subtype='PCM_16')
+            else:
+                # 保存为WAV（转换为16位PCM）
+                wavfile.write(filepath, self.sample_rate, self.to_pcm16(audio_data))
+            self.logger.info(f"音频已成功导出: {filepath}")
             return True
             
         except Exception as e:
-            print(f"导出音频失败: {e}")
+            self.logger.error(f"导出音频失败: {e}")
             return False
     def setup_logger(self):
         """设置日志记录器"""
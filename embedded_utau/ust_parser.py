@@ -1,43 +1,150 @@
 # embedded_utau/ust_parser.py
+import codecs
+import mmap
 import re
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
-import chardet
 from .note import Note, Track
 from .project import Project, ProjectSettings
 
+# 预编译的正则表达式，避免每次解析重复编译
+_TEMPO_RE = re.compile(r'Tempo=([\d.]+)')
+_VOICE_DIR_RE = re.compile(r'VoiceDir=([^\r\n]+)')
+_NON_ASCII_RE = re.compile(rb'[\x80-\xff]')
+_KANA_RE = re.compile(r'[\u3040-\u30ff]')
+
+# 编码检测最多检查的字节数
+_DETECT_BYTES = 32768
+
+
+def _note_field(key: str) -> str:
+    """可选前瞻：在当前段内（下一个 [ 开头的段标题之前）取第一个非空的 key=值"""
+    return rf'(?:(?=(?:(?!\[)[^\n]*\n)*?{key}=([^\r\n]+)))?'
+
+
+# 每个 [#数字] 音符段只匹配一次，通过前瞻同时取出所有字段
+_NOTE_RE = re.compile(
+    r'^\[#\d+\][^\n]*\n' + ''.join(_note_field(key) for key in ('Lyric', 'NoteNum', 'Length', 'Position')),
+    re.MULTILINE
+)
+
+
+@lru_cache(maxsize=None)
+def _value_re(key: str):
+    """键值提取正则（按键名缓存）"""
+    return re.compile(rf'{key}=([^\r\n]+)')
+
+
 class USTParser:
     """UST 文件解析器 - 支持 UTAU 项目文件导入导出"""
     
+    # 音符常用键的预编译正则（其他键按需编译并缓存）
+    _FIELD_RES = {key: _value_re(key) for key in ('Lyric', 'NoteNum', 'Length', 'Position')}
+    
     def __init__(self):
         self.supported_encodings = ['shift_jis', 'utf-8', 'cp932', 'utf-16']
     
     def detect_encoding(self, file_path: Path) -> str:
-        """检测文件编码"""
+        """检测文件编码（通过内存映射，只读取检测所需的部分）"""
         with open(file_path, 'rb') as f:
-            raw_data = f.read()
-            result = chardet.detect(raw_data)
-            encoding = result['encoding']
-            
-            # 处理常见的编码映射
-            encoding_map = {
-                'SHIFT_JIS': 'shift_jis',
-                'UTF-8': 'utf-8',
-                'UTF-16': 'utf-16',
-                'GB2312': 'gbk',
-                'ISO-8859-1': 'cp932'
-            }
-            
-            detected = encoding_map.get(encoding.upper() if encoding else '', 'shift_jis')
-            print(f"检测到文件编码: {detected} (原始: {encoding})")
-            return detected
+            try:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件无法映射
+                return self.detect_buffer_encoding(b'')
+            with buffer:
+                return self.detect_buffer_encoding(buffer)
+    
+    def detect_buffer_encoding(self, buffer) -> str:
+        """检测字节数据（bytes / mmap 等）的编码
+        
+        依次检查 BOM、从首个非 ASCII 字符起的 32KB 能否按 UTF-8 / Shift-JIS 解码，
+        仍无法确定时才使用 chardet
+        """
+        head = bytes(buffer[:_DETECT_BYTES])
+        
+        if head.startswith(codecs.BOM_UTF8):
+            detected = 'utf-8-sig'
+        elif head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            detected = 'utf-16'
+        elif b'\x00' in head:
+            # 无 BOM 的 UTF-16 等
+            detected = self._detect_with_chardet(head)
+        else:
+            match = _NON_ASCII_RE.search(buffer)
+            if match is None:
+                # 纯 ASCII，按 UTAU 默认编码解码结果相同
+                detected = 'shift_jis'
+            else:
+                # 首个非 ASCII 字节必为多字节字符的首字节，从这里截取样本
+                end = match.start() + _DETECT_BYTES
+                sample = bytes(buffer[match.start():end])
+                final = end >= len(buffer)
+                detected = None
+                try:
+                    codecs.getincrementaldecoder('utf-8')().decode(sample, final=final)
+                    detected = 'utf-8'
+                except UnicodeDecodeError:
+                    for encoding in ('shift_jis', 'cp932'):
+                        try:
+                            text = codecs.getincrementaldecoder(encoding)().decode(sample, final=final)
+                        except UnicodeDecodeError:
+                            continue
+                        # 日文歌词几乎都含假名；不含假名时可能是 GBK 等，交给 chardet 判断
+                        if _KANA_RE.search(text):
+                            detected = encoding
+                        break
+                if detected is None:
+                    detected = self._detect_with_chardet(sample)
+        
+        print(f"检测到文件编码: {detected}")
+        return detected
+    
+    def _detect_with_chardet(self, data: bytes) -> str:
+        """使用 chardet 检测编码（较慢，只在快速检测无法确定时使用）"""
+        import chardet
+        result = chardet.detect(data)
+        encoding = result['encoding']
+        
+        # 处理常见的编码映射
+        encoding_map = {
+            'SHIFT_JIS': 'shift_jis',
+            'UTF-8': 'utf-8',
+            'UTF-16': 'utf-16',
+            'GB2312': 'gbk',
+            'GBK': 'gbk',
+            'GB18030': 'gb18030',
+            'ISO-8859-1': 'cp932'
+        }
+        
+        detected = encoding_map.get(encoding.upper() if encoding else '', 'shift_jis')
+        print(f"chardet 检测结果: {detected} (原始: {encoding})")
+        return detected
     
     def parse_ust_file(self, file_path: Path) -> Project:
-        """解析 UST 文件并转换为 Project 对象"""
-        encoding = self.detect_encoding(file_path)
+        """解析 UST 文件并转换为 Project 对象（通过内存映射读取）"""
+        file_path = Path(file_path)
+        with open(file_path, 'rb') as f:
+            try:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件无法映射
+                buffer = b''
+            try:
+                return self.parse_ust_buffer(buffer, file_path)
+            finally:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+    
+    def parse_ust_buffer(self, buffer, file_path: Path) -> Project:
+        """解析 UST 字节数据（bytes / mmap 等）并转换为 Project 对象
         
-        with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-            content = f.read()
+        file_path 用于确定工程名称和查找音源库的基准目录
+        """
+        file_path = Path(file_path)
+        encoding = self.detect_buffer_encoding(buffer)
+        content = str(buffer, encoding, errors='replace')
         
         print(f"开始解析 UST 文件: {file_path.name}")
         
@@ -60,7 +167,7 @@ class USTParser:
         settings = ProjectSettings()
         
         # 解析曲速
-        tempo_match = re.search(r'Tempo=([\d.]+)', content)
+        tempo_match = _TEMPO_RE.search(content)
         if tempo_match:
             settings.tempo = float(tempo_match.group(1))
             print(f"解析曲速: {settings.tempo}")
@@ -103,7 +210,7 @@ class USTParser:
     def parse_voice_library(self, section: str, base_dir: Path) -> Optional[Path]:
         """解析音源库路径"""
         # 查找 VoiceDir 或 Project 设置
-        voice_dir_match = re.search(r'VoiceDir=([^\r\n]+)', section)
+        voice_dir_match = _VOICE_DIR_RE.search(section)
         if voice_dir_match:
             voice_dir = voice_dir_match.group(1).strip()
             # 处理 UTAU 的相对路径
@@ -126,11 +233,9 @@ class USTParser:
         """解析音符数据"""
         notes = []
         
-        # 分割为单个音符部分
-        note_sections = re.findall(r'\[#\d+\][^[]+', section, re.DOTALL)
-        
-        for note_section in note_sections:
-            note = self.parse_single_note(note_section)
+        # 单次正则扫描取出所有音符段的字段，无需先切分音符段
+        for lyric, note_num, length, position in _NOTE_RE.findall(section):
+            note = self._make_note(lyric.strip(), note_num.strip(), length.strip(), position.strip())
             if note:
                 notes.append(note)
         
@@ -141,20 +246,24 @@ class USTParser:
     
     def parse_single_note(self, note_section: str) -> Optional[Note]:
         """解析单个音符"""
+        return self._make_note(
+            self.extract_value(note_section, 'Lyric'),
+            self.extract_value(note_section, 'NoteNum'),
+            self.extract_value(note_section, 'Length'),
+            self.extract_value(note_section, 'Position'),
+        )
+    
+    def _make_note(self, lyric, note_num, length, position) -> Optional[Note]:
+        """由 UST 字段值创建音符（休止符或缺少必要字段时返回 None）"""
         try:
-            # 提取基本属性
-            lyric = self.extract_value(note_section, 'Lyric')
             if not lyric or lyric == 'R' or lyric == 'r':  # 休止符
                 return None
             
-            note_num = self.extract_value(note_section, 'NoteNum')
-            length = self.extract_value(note_section, 'Length')
-            
             if not note_num or not length:
                 return None
             
             # 计算开始时间（基于位置和前面的音符）
-            position = self.extract_value(note_section, 'Position') or "0"
+            position = position or "0"
             
             # 转换数据
             pitch = int(note_num)
@@ -190,8 +299,8 @@ class USTParser:
     
     def extract_value(self, text: str, key: str) -> Optional[str]:
         """从文本中提取键值"""
-        pattern = rf'{key}=([^\r\n]+)'
-        match = re.search(pattern, text)
+        pattern = self._FIELD_RES.get(key) or _value_re(key)
+        match = pattern.search(text)
         return match.group(1).strip() if match else None
     
     def export_to_ust(self, project: Project, file_path: Path) -> bool:
@@ -0,0 +1,27 @@
+# embedded_utau/utils/__init__.py
+"""内部通用工具"""
+import multiprocessing
+import os
+from pathlib import Path
+
+
+def user_cache_dir() -> Path:
+    """用户级缓存目录（优先使用 platformdirs）"""
+    try:
+        from platformdirs import user_cache_dir as _user_cache_dir
+        return Path(_user_cache_dir("pyutau"))
+    except ImportError:
+        if os.name == 'nt':
+            base = os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+        else:
+            base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+        return Path(base) / 'pyutau'
+
+
+def process_pool_context():
+    """进程池使用的多进程上下文：forkserver（不支持时用 spawn）
+    
+    调用方可能是多线程的界面进程，直接 fork 会把其他线程持有的锁一并复制到子进程中
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
@@ -2,19 +2,272 @@
 import os
 import numpy as np
 import librosa
+from collections import OrderedDict
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import List, Dict, Optional, Tuple
+import bisect
 import tempfile
+import threading
 import re
 import json
 from PIL import Image, ImageTk
 import io
+import logging
 try:
     from embedded_utau.note import Note, Track
 except ImportError:
     from .note import Note, Track
 
+logger = logging.getLogger(__name__)
+
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+try:
+    # signalsmith-stretch 的 Python 绑定，比 librosa 相位声码器更快且相位感更弱
+    import python_stretch
+    STRETCH_AVAILABLE = True
+except ImportError:
+    STRETCH_AVAILABLE = False
+
+# 相位声码器移调的 STFT 参数
+_SHIFT_N_FFT = 2048  # 增加FFT大小以提高质量
+_SHIFT_HOP = 512  # 优化hop长度
+
+# 移调结果 LRU 缓存上限（条目数 / 字节数）
+_SHIFT_CACHE_MAX_ENTRIES = 256
+_SHIFT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _load_one(path, sample_rate):
+    """用 soundfile 以原生采样率解码（C 层释放 GIL），仅采样率不同时才重采样
+    
+    同时用作预加载工作进程的任务函数。返回 (音频, 采样率, 样本长度)，
+    soundfile 无法读取时返回 None，交由 librosa 加载
+    """
+    try:
+        data, file_sr = sf.read(str(path), dtype='float32', always_2d=False)
+    except Exception:
+        return None
+    if data.ndim > 1:
+        data = data.mean(axis=1, dtype=np.float32)
+    if file_sr != sample_rate:
+        data = librosa.resample(data, orig_sr=file_sr, target_sr=sample_rate)
+    return data, sample_rate, len(data)
+
+
+def _read_text(path, encodings):
+    """只读取一次文件，按顺序尝试各编码解码
+    
+    返回 (文本, 编码)，换行符统一为 LF（与文本模式读取一致）；全部失败返回 None
+    """
+    raw = Path(path).read_bytes()
+    for encoding in encodings:
+        try:
+            content = raw.decode(encoding)
+        except UnicodeDecodeError:
+            logger.debug(f"编码 {encoding} 解码失败")
+            continue
+        return content.replace('\r\n', '\n').replace('\r', '\n'), encoding
+    return None
+
+
+# 文件名解析用的正则（模块加载时编译一次）
+_PITCH_MARK_RE = re.compile(r'[A-G][#b]?\d+', re.IGNORECASE)
+_DIGITS_RE = re.compile(r'\d+')
+_SEPARATOR_RE = re.compile(r'[._-]')
+_JAPANESE_CHAR_RE = re.compile(r'[ぁ-んァ-ンー]')
+_KANA_RE = re.compile(r'[ぁ-んァ-ン]')
+_CHINESE_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
+_KOREAN_CHAR_RE = re.compile(r'[가-힣]')
+
+# 更全面的音高模式匹配
+_PITCH_PATTERNS = [
+    # 低音区
+    (['C1'], 24), (['C#1', 'Db1'], 25), (['D1'], 26), (['D#1', 'Eb1'], 27),
+    (['E1'], 28), (['F1'], 29), (['F#1', 'Gb1'], 30), (['G1'], 31),
+    (['G#1', 'Ab1'], 32), (['A1'], 33), (['A#1', 'Bb1'], 34), (['B1'], 35),
+    # 中低音区
+    (['C2'], 36), (['C#2', 'Db2'], 37), (['D2'], 38), (['D#2', 'Eb2'], 39),
+    (['E2'], 40), (['F2'], 41), (['F#2', 'Gb2'], 42), (['G2'], 43),
+    (['G#2', 'Ab2'], 44), (['A2'], 45), (['A#2', 'Bb2'], 46), (['B2'], 47),
+    # 中音区
+    (['C3'], 48), (['C#3', 'Db3'], 49), (['D3'], 50), (['D#3', 'Eb3'], 51),
+    (['E3'], 52), (['F3'], 53), (['F#3', 'Gb3'], 54), (['G3'], 55),
+    (['G#3', 'Ab3'], 56), (['A3'], 57), (['A#3', 'Bb3'], 58), (['B3'], 59),
+    # 中央C区
+    (['C4'], 60), (['C#4', 'Db4'], 61), (['D4'], 62), (['D#4', 'Eb4'], 63),
+    (['E4'], 64), (['F4'], 65), (['F#4', 'Gb4'], 66), (['G4'], 67),
+    (['G#4', 'Ab4'], 68), (['A4'], 69), (['A#4', 'Bb4'], 70), (['B4'], 71),
+    # 高音区
+    (['C5'], 72), (['C#5', 'Db5'], 73), (['D5'], 74), (['D#5', 'Eb5'], 75),
+    (['E5'], 76), (['F5'], 77), (['F#5', 'Gb5'], 78), (['G5'], 79),
+    (['G#5', 'Ab5'], 80), (['A5'], 81), (['A#5', 'Bb5'], 82), (['B5'], 83),
+    # 超高音区
+    (['C6'], 84), (['C#6', 'Db6'], 85), (['D6'], 86), (['D#6', 'Eb6'], 87),
+    (['E6'], 88), (['F6'], 89), (['F#6', 'Gb6'], 90), (['G6'], 91),
+    (['G#6', 'Ab6'], 92), (['A6'], 93), (['A#6', 'Bb6'], 94), (['B6'], 95),
+]
+
+# 音名 -> MIDI 音高；文件名统一转为大写后匹配，因此只保留大写音名（降号写法无法命中）
+_NOTE_TO_MIDI = {
+    name: midi_pitch
+    for note_names, midi_pitch in _PITCH_PATTERNS
+    for name in note_names if name == name.upper()
+}
+# 前瞻匹配可找出重叠出现的音名（如 "C#4C4"）
+_NOTE_NAME_RE = re.compile(
+    '(?=(' + '|'.join(map(re.escape, sorted(_NOTE_TO_MIDI, key=len, reverse=True))) + '))'
+)
+
+# 发音相似性映射（简化的实现）：分组名 -> 组内写法
+_PRONUNCIATION_GROUPS = {
+    'a': ['a', 'ah', 'aa'],
+    'i': ['i', 'ee', 'ii'],
+    'u': ['u', 'oo', 'uu'],
+    'e': ['e', 'eh'],
+    'o': ['o', 'oh'],
+    'ka': ['ka', 'ca'],
+    'ki': ['ki', 'key'],
+    'ku': ['ku', 'coo'],
+    'ke': ['ke', 'kay'],
+    'ko': ['ko', 'co'],
+}
+# 写法 -> 分组名
+_PRONUNCIATION_GROUP = {
+    member: group for group, members in _PRONUNCIATION_GROUPS.items() for member in members
+}
+
+
+def _substrings(text: str):
+    """text 的全部不同子串（含空串）"""
+    return {text[i:j] for i in range(len(text) + 1) for j in range(i, len(text) + 1)}
+
+
+# 常见的辅音+元音音节（英文等音源的歌词推断）
+_COMMON_SYLLABLES = frozenset({
+    'la', 'le', 'li', 'lo', 'lu', 'ra', 're', 'ri', 'ro', 'ru',
+    'ma', 'me', 'mi', 'mo', 'mu', 'na', 'ne', 'ni', 'no', 'nu',
+    'pa', 'pe', 'pi', 'po', 'pu', 'ba', 'be', 'bi', 'bo', 'bu',
+})
+
+
+@lru_cache(maxsize=8192)
+def _lyric_from_stem(filename: str) -> str:
+    """从文件名（不含扩展名）推断歌词，结果按文件名缓存"""
+    # 移除音高标记
+    cleaned = _PITCH_MARK_RE.sub('', filename)
+    
+    # 移除数字
+    cleaned = _DIGITS_RE.sub('', cleaned)
+    
+    # 移除常见分隔符和扩展名相关
+    cleaned = _SEPARATOR_RE.sub('', cleaned)
+    
+    # 如果是日语音源，尝试提取平假名或片假名
+    # 中文、韩语音源同理，取第一个匹配的字符
+    for char_re in (_JAPANESE_CHAR_RE, _CHINESE_CHAR_RE, _KOREAN_CHAR_RE):
+        char_match = char_re.search(cleaned)
+        if char_match:
+            return char_match.group()
+    
+    # 如果是英文或其他，返回前2个字母（如果是辅音+元音组合）
+    if len(cleaned) >= 2:
+        # 检查是否是常见的音节组合
+        first_two = cleaned[:2].lower()
+        if first_two in _COMMON_SYLLABLES:
+            return first_two
+    
+    # 返回第一个非空字符
+    if cleaned:
+        return cleaned[0]
+    
+    # 最后手段：使用文件名前2个字符
+    return filename[:2] if len(filename) >= 2 else filename
+
+
+# 支持的音频扩展名（按优先级排列）
+_AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg')
+
+
+def _scandir_audio(root):
+    """递归扫描音频文件，返回 (路径, 文件名) 字符串；先返回当前目录的文件再进入子目录，跳过符号链接
+    
+    DirEntry 自带文件类型信息，扫描时无需逐个 stat
+    """
+    subdirs = []
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(_AUDIO_EXTENSIONS):
+                    yield entry.path, entry.name
+    except OSError as e:
+        logger.warning(f"扫描目录失败 {root}: {e}")
+    for subdir in subdirs:
+        yield from _scandir_audio(subdir)
+
+
+@lru_cache(maxsize=None)
+def _get_stretcher(sample_rate: int):
+    """按采样率缓存的单声道 Stretch 实例，复用其分块/窗口配置"""
+    stretch = python_stretch.Signalsmith.Stretch()
+    stretch.preset(1, sample_rate)
+    return stretch
+
+
+class SampleArena:
+    """样本音频的连续 float32 存储区
+    
+    所有样本的音频依次存放在同一块内存中，样本的 sample_data 是其中的切片视图；
+    扩容时整体复制并重新绑定全部视图
+    """
+    
+    def __init__(self, capacity: int = 0):
+        self._buffer = np.empty(capacity, dtype=np.float32)
+        self._used = 0
+        self._spans: List[Tuple['VoiceSample', int, int]] = []
+        self._lock = threading.Lock()
+    
+    @property
+    def nbytes(self) -> int:
+        """已使用的字节数"""
+        return self._used * self._buffer.itemsize
+    
+    def reserve(self, extra: int):
+        """预留 extra 个采样点的空间，批量加载前调用可避免反复扩容"""
+        with self._lock:
+            self._grow(self._used + extra)
+    
+    def _grow(self, required: int):
+        """容量不足时按倍数扩容（调用方需持有锁）"""
+        if required <= self._buffer.size:
+            return
+        buffer = np.empty(max(required, 2 * self._buffer.size), dtype=np.float32)
+        buffer[:self._used] = self._buffer[:self._used]
+        self._buffer = buffer
+        for sample, offset, length in self._spans:
+            sample.sample_data = buffer[offset:offset + length]
+    
+    def adopt(self, sample: 'VoiceSample', data: np.ndarray):
+        """把音频复制进存储区，并让 sample.sample_data 指向对应切片"""
+        length = len(data)
+        with self._lock:
+            self._grow(self._used + length)
+            offset = self._used
+            view = self._buffer[offset:offset + length]
+            view[:] = data
+            self._used += length
+            self._spans.append((sample, offset, length))
+            sample.sample_data = view
+
+
 @dataclass
 class VoiceSample:
     """语音样本类"""
@@ -24,20 +277,36 @@ class VoiceSample:
     sample_data: Optional[np.ndarray] = None
     sample_rate: int = 44100
     original_length: int = 0
+    # 所属音源库的连续存储区，为 None 时音频单独保存
+    arena: Optional[SampleArena] = field(default=None, repr=False, compare=False)
+    # 移调用的分析 STFT，首次移调时计算，同一样本的不同移调共用
+    _stft: Optional[np.ndarray] = field(default=None, init=False, repr=False, compare=False)
     
     def load_sample(self):
         """加载音频样本"""
         if self.sample_data is None:
             try:
-                self.sample_data, self.sample_rate = librosa.load(
-                    str(self.file_path), sr=self.sample_rate, mono=True
-                )
-                self.original_length = len(self.sample_data)
+                result = _load_one(self.file_path, self.sample_rate) if sf is not None else None
+                if result is not None:
+                    data, self.sample_rate, _ = result
+                else:
+                    # soundfile 不支持的格式（如部分 mp3）仍由 librosa/audioread 解码
+                    data, self.sample_rate = librosa.load(
+                        str(self.file_path), sr=self.sample_rate, mono=True, dtype=np.float32
+                    )
             except Exception as e:
-                print(f"加载样本失败 {self.file_path}: {e}")
+                logger.warning(f"加载样本失败 {self.file_path}: {e}")
                 # 创建一个静音样本作为后备
-                self.sample_data = np.zeros(self.sample_rate)
-                self.original_length = self.sample_rate
+                data = np.zeros(self.sample_rate, dtype=np.float32)
+            self.set_sample_data(data)
+    
+    def set_sample_data(self, data: np.ndarray):
+        """设置样本音频，有存储区时复制进存储区"""
+        self.original_length = len(data)
+        if self.arena is not None:
+            self.arena.adopt(self, data)
+        else:
+            self.sample_data = data
     
     def get_pitch_shifted(self, target_pitch: int) -> np.ndarray:
         """获取移调后的样本"""
@@ -48,17 +317,36 @@ class VoiceSample:
             return self.sample_data.copy()
         
         try:
-            # 使用更高质量的音高移动参数
-            return librosa.effects.pitch_shift(
-                self.sample_data, 
-                sr=self.sample_rate, 
-                n_steps=semitones,
-                n_fft=2048,  # 增加FFT大小以提高质量
-                hop_length=512  # 优化hop长度
-            )
+            if STRETCH_AVAILABLE:
+                stretch = _get_stretcher(self.sample_rate)
+                stretch.reset()
+                stretch.setTransposeSemitones(float(semitones))
+                audio = np.ascontiguousarray(self.sample_data, dtype=np.float32)[np.newaxis, :]
+                shifted = np.asarray(stretch.process(audio), dtype=np.float32)[0]
+                return librosa.util.fix_length(shifted, size=len(self.sample_data))
+            
+            return self._vocoder_shift(semitones)
         except Exception as e:
-            print(f"音高移动失败: {e}")
+            logger.warning(f"音高移动失败: {e}")
             return self.sample_data.copy()
+    
+    def _vocoder_shift(self, semitones: int) -> np.ndarray:
+        """相位声码器移调（与 librosa.effects.pitch_shift 相同），复用缓存的分析 STFT
+        
+        同一样本的 N 次不同移调只需 1 次 STFT + N 次 iSTFT
+        """
+        if self._stft is None:
+            self._stft = librosa.stft(self.sample_data, n_fft=_SHIFT_N_FFT, hop_length=_SHIFT_HOP)
+        
+        length = len(self.sample_data)
+        rate = 2.0 ** (-float(semitones) / 12)
+        stretched = librosa.phase_vocoder(self._stft, rate=rate, hop_length=_SHIFT_HOP, n_fft=_SHIFT_N_FFT)
+        audio = librosa.istft(
+            stretched, n_fft=_SHIFT_N_FFT, hop_length=_SHIFT_HOP,
+            dtype=self.sample_data.dtype, length=int(round(length / rate))
+        )
+        audio = librosa.resample(audio, orig_sr=float(self.sample_rate) / rate, target_sr=self.sample_rate)
+        return librosa.util.fix_length(audio, size=length)
 
 class VoiceLibrary:
     """音源库管理器"""
@@ -68,35 +356,64 @@ class VoiceLibrary:
         self.samples: Dict[str, List[VoiceSample]] = {}
         self.oto_ini_data: Dict[str, Dict] = {}
         self.character_info: Dict[str, str] = {}
-        self.avatar_image: Optional[Image.Image] = None
+        self._avatar_image: Optional[Image.Image] = None
+        self._avatar_candidates: List[Path] = []  # 待解码的头像文件，首次访问 avatar_image 时解码
         self.avatar_photo: Optional[ImageTk.PhotoImage] = None
+        # 移调结果缓存：(样本文件, 半音数) -> 只读音频（LRU）
+        self._shift_cache: "OrderedDict[Tuple[Path, int], np.ndarray]" = OrderedDict()
+        self._shift_cache_bytes = 0
+        # 在移调缓存中仍有条目的样本：样本文件 -> [样本, 条目数, 已计入缓存大小的 STFT 字节数]；
+        # 样本的分析 STFT 计入缓存预算，最后一个条目被淘汰时一并释放
+        self._stft_owners: Dict[Path, list] = {}
+        # 全部样本音频共用的连续存储区
+        self._arena = SampleArena()
+        # get_best_sample 结果缓存：(歌词, 目标音高) -> 样本，样本增减时清空
+        self._best_cache: Dict[Tuple[str, int], Optional[VoiceSample]] = {}
+        # 每个歌词按音高排序后的音高列表，与 self.samples[歌词] 一一对应
+        self._pitches: Dict[str, List[int]] = {}
+        # find_similar_lyrics 用的歌词索引，出现新歌词时重建
+        self._lyric_index = None
+        # 音高范围，添加样本时增量更新
+        self._min_pitch: Optional[int] = None
+        self._max_pitch: Optional[int] = None
+        # 一级子目录列表只扫描一次，供角色信息/头像/oto.ini 查找共用
+        self._subdirs = self._scan_subdirs()
         
         # 首先加载角色信息，确保名称正确
         self.load_character_info()
         self.load_avatar()
         self.load_library()
     
+    def _scan_subdirs(self) -> List[Path]:
+        """扫描音源库根目录下的一级子目录（DirEntry 自带类型信息，无需逐个 stat）"""
+        try:
+            with os.scandir(self.library_path) as it:
+                return [Path(entry.path) for entry in it if entry.is_dir()]
+        except OSError as e:
+            logger.warning(f"无法读取音源库目录 {self.library_path}: {e}")
+            return []
+    
     def load_library(self):
         """加载音源库"""
-        print(f"正在加载音源库: {self.library_path}")
-        print(f"音源库名称: {self.get_library_name()}")
+        logger.info(f"正在加载音源库: {self.library_path}")
+        logger.info(f"音源库名称: {self.get_library_name()}")
         
         # 首先尝试加载 oto.ini
         self.load_oto_ini()
         
-        # 扫描音频文件
-        audio_extensions = ['.wav', '.mp3', '.flac', '.ogg']
-        audio_files = []
+        # 单次遍历扫描音频文件，按扩展名优先级稳定排序（同音高时优先 .wav）
+        audio_files = sorted(
+            _scandir_audio(self.library_path),
+            key=lambda f: _AUDIO_EXTENSIONS.index('.' + f[1].rpartition('.')[2].lower())
+        )
         
-        for ext in audio_extensions:
-            audio_files.extend(list(self.library_path.rglob(f"*{ext}")))
+        logger.info(f"找到 {len(audio_files)} 个音频文件")
         
-        print(f"找到 {len(audio_files)} 个音频文件")
+        for path, name in audio_files:
+            self.add_sample(path, name)
+        self._index_samples()
         
-        for audio_file in audio_files:
-            self.add_sample(audio_file)
-        
-        print(f"音源库加载完成，共 {len(self.samples)} 种歌词")
+        logger.info(f"音源库加载完成，共 {len(self.samples)} 种歌词")
     
     def load_character_info(self):
         """加载角色信息"""
@@ -116,7 +433,7 @@ class VoiceLibrary:
         for char_file in character_files:
             char_path = self.library_path / char_file
             if char_path.exists():
-                print(f"在根目录找到角色文件: {char_path}")
+                logger.debug(f"在根目录找到角色文件: {char_path}")
                 found_character_file = True
                 try:
                     # 根据文件类型使用不同的解析方法
@@ -125,151 +442,133 @@ class VoiceLibrary:
                     else:
                         self.parse_text_character_info(char_path)
                     
-                    print(f"成功加载角色信息: {char_file}")
-                    print(f"角色信息: {self.character_info}")
+                    logger.debug(f"成功加载角色信息: {char_file}")
+                    logger.debug(f"角色信息: {self.character_info}")
                     break
                 except Exception as e:
-                    print(f"解析角色信息文件失败 {char_file}: {e}")
+                    logger.warning(f"解析角色信息文件失败 {char_file}: {e}")
         
         # 如果在根目录没找到，搜索子目录
         if not found_character_file:
-            print("在根目录未找到角色文件，搜索子目录...")
-            for subdir in self.library_path.iterdir():
-                if subdir.is_dir():
-                    print(f"搜索子目录: {subdir}")
-                    for char_file in character_files:
-                        char_path = subdir / char_file
-                        if char_path.exists():
-                            print(f"在子目录找到角色文件: {char_path}")
-                            found_character_file = True
-                            try:
-                                if char_path.suffix.lower() in ['.yaml', '.yml']:
-                                    self.parse_yaml_character_info(char_path)
-                                else:
-                                    self.parse_text_character_info(char_path)
-                                
-                                print(f"成功加载角色信息: {char_file}")
-                                print(f"角色信息: {self.character_info}")
-                                break
-                            except Exception as e:
-                                print(f"解析角色信息文件失败 {char_file}: {e}")
-                    if found_character_file:
-                        break
+            logger.debug("在根目录未找到角色文件，搜索子目录...")
+            for subdir in self._subdirs:
+                logger.debug(f"搜索子目录: {subdir}")
+                for char_file in character_files:
+                    char_path = subdir / char_file
+                    if char_path.exists():
+                        logger.debug(f"在子目录找到角色文件: {char_path}")
+                        found_character_file = True
+                        try:
+                            if char_path.suffix.lower() in ['.yaml', '.yml']:
+                                self.parse_yaml_character_info(char_path)
+                            else:
+                                self.parse_text_character_info(char_path)
+                            
+                            logger.debug(f"成功加载角色信息: {char_file}")
+                            logger.debug(f"角色信息: {self.character_info}")
+                            break
+                        except Exception as e:
+                            logger.warning(f"解析角色信息文件失败 {char_file}: {e}")
+                if found_character_file:
+                    break
         
         # 如果没有找到角色文件，使用文件夹名作为音源库名
         if not found_character_file or not self.character_info.get('name'):
             # 尝试从子目录名获取名称
-            subdirs = [d for d in self.library_path.iterdir() if d.is_dir()]
-            if subdirs:
+            if self._subdirs:
                 # 使用第一个子目录的名称
-                self.character_info['name'] = subdirs[0].name
-                print(f"使用子目录名作为音源库名: {subdirs[0].name}")
+                self.character_info['name'] = self._subdirs[0].name
+                logger.info(f"使用子目录名作为音源库名: {self._subdirs[0].name}")
             else:
                 self.character_info['name'] = self.library_path.name
-                print(f"使用文件夹名作为音源库名: {self.library_path.name}")
+                logger.info(f"使用文件夹名作为音源库名: {self.library_path.name}")
     
     def parse_yaml_character_info(self, yaml_path: Path):
         """解析YAML格式的角色信息"""
         try:
             # 尝试导入yaml模块
             import yaml
-            
-            # 尝试多种编码
-            encodings = ['utf-8', 'shift_jis', 'cp932', 'utf-16']
-            for encoding in encodings:
-                try:
-                    with open(yaml_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                    
-                    print(f"YAML文件内容 (编码: {encoding}):")
-                    print(content[:500])  # 打印前500个字符
-                    
-                    # 解析YAML
-                    data = yaml.safe_load(content)
-                    
-                    if data:
-                        print(f"解析的YAML数据: {data}")
-                        # 提取角色信息
-                        if 'name' in data:
-                            self.character_info['name'] = data['name']
-                        if 'author' in data:
-                            self.character_info['author'] = data['author']
-                        elif 'created_by' in data:
-                            self.character_info['author'] = data['created_by']
-                        if 'image' in data:
-                            self.character_info['image'] = data['image']
-                        if 'description' in data:
-                            self.character_info['description'] = data['description']
-                    
-                    break
-                except UnicodeDecodeError:
-                    print(f"编码 {encoding} 解码失败")
-                    continue
-                except yaml.YAMLError as e:
-                    print(f"YAML解析错误: {e}")
-                    # 如果YAML解析失败，尝试简单文本解析
-                    self.fallback_yaml_parsing(yaml_path)
-                    break
-                    
         except ImportError:
-            print("未安装PyYAML，使用简单解析")
+            logger.debug("未安装PyYAML，使用简单解析")
             self.fallback_yaml_parsing(yaml_path)
+            return
+        
+        # 尝试多种编码
+        decoded = _read_text(yaml_path, ('utf-8', 'shift_jis', 'cp932', 'utf-16'))
+        if decoded is None:
+            return
+        content, encoding = decoded
+        
+        logger.debug(f"YAML文件内容 (编码: {encoding}):")
+        logger.debug(content[:500])  # 记录前500个字符
+        
+        # 解析YAML
+        try:
+            data = yaml.safe_load(content)
+        except yaml.YAMLError as e:
+            logger.warning(f"YAML解析错误: {e}")
+            # 如果YAML解析失败，尝试简单文本解析
+            self.fallback_yaml_parsing(yaml_path)
+            return
+        
+        if data:
+            logger.debug(f"解析的YAML数据: {data}")
+            # 提取角色信息
+            if 'name' in data:
+                self.character_info['name'] = data['name']
+            if 'author' in data:
+                self.character_info['author'] = data['author']
+            elif 'created_by' in data:
+                self.character_info['author'] = data['created_by']
+            if 'image' in data:
+                self.character_info['image'] = data['image']
+            if 'description' in data:
+                self.character_info['description'] = data['description']
     
     def fallback_yaml_parsing(self, yaml_path: Path):
         """YAML解析失败时的后备方案"""
         # 尝试多种编码
-        encodings = ['utf-8', 'shift_jis', 'cp932', 'utf-16']
-        for encoding in encodings:
-            try:
-                with open(yaml_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                
-                print(f"使用后备解析，文件内容 (编码: {encoding}):")
-                print(content[:500])  # 打印前500个字符
+        decoded = _read_text(yaml_path, ('utf-8', 'shift_jis', 'cp932', 'utf-16'))
+        if decoded is None:
+            return
+        content, encoding = decoded
+        
+        logger.debug(f"使用后备解析，文件内容 (编码: {encoding}):")
+        logger.debug(content[:500])  # 记录前500个字符
+        
+        # 简单的键值对提取
+        lines = content.split('\n')
+        for line in lines:
+            line = line.strip()
+            if ':' in line and not line.startswith('#'):  # 忽略注释
+                key, value = line.split(':', 1)
+                key = key.strip().lower()
+                value = value.strip().strip('"\'')  # 移除引号
                 
-                # 简单的键值对提取
-                lines = content.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if ':' in line and not line.startswith('#'):  # 忽略注释
-                        key, value = line.split(':', 1)
-                        key = key.strip().lower()
-                        value = value.strip().strip('"\'')  # 移除引号
-                        
-                        print(f"解析键值对: {key} = {value}")
-                        
-                        if key == 'name':
-                            self.character_info['name'] = value
-                        elif key in ['author', 'created_by']:
-                            self.character_info['author'] = value
-                        elif key == 'image':
-                            self.character_info['image'] = value
-                        elif key == 'description':
-                            self.character_info['description'] = value
+                logger.debug(f"解析键值对: {key} = {value}")
                 
-                break
-            except UnicodeDecodeError:
-                print(f"编码 {encoding} 解码失败")
-                continue
+                if key == 'name':
+                    self.character_info['name'] = value
+                elif key in ['author', 'created_by']:
+                    self.character_info['author'] = value
+                elif key == 'image':
+                    self.character_info['image'] = value
+                elif key == 'description':
+                    self.character_info['description'] = value
     
     def parse_text_character_info(self, text_path: Path):
         """解析文本格式的角色信息"""
         # 尝试多种编码
-        encodings = ['shift_jis', 'utf-8', 'cp932', 'gbk', 'utf-16']
-        for encoding in encodings:
-            try:
-                with open(text_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                
-                print(f"文本文件内容 (编码: {encoding}):")
-                print(content[:500])  # 打印前500个字符
-                
-                # 解析角色信息
-                self.parse_character_info(content)
-                break
-            except UnicodeDecodeError:
-                print(f"编码 {encoding} 解码失败")
-                continue
+        decoded = _read_text(text_path, ('shift_jis', 'utf-8', 'cp932', 'gbk', 'utf-16'))
+        if decoded is None:
+            return
+        content, encoding = decoded
+        
+        logger.debug(f"文本文件内容 (编码: {encoding}):")
+        logger.debug(content[:500])  # 记录前500个字符
+        
+        # 解析角色信息
+        self.parse_character_info(content)
     
     def parse_character_info(self, content: str):
         """解析角色信息内容"""
@@ -305,26 +604,51 @@ class VoiceLibrary:
                     self.character_info['description'] = value
     
     def load_avatar(self):
-        """加载头像图片 - 简化版本，只检测子目录下的.bmp文件"""
-        print("搜索子目录中的.bmp头像文件...")
+        """查找头像图片 - 简化版本，只检测子目录下的.bmp文件，解码推迟到首次使用"""
+        logger.debug("搜索子目录中的.bmp头像文件...")
         
         # 只在子目录中搜索.bmp文件
-        for subdir in self.library_path.iterdir():
-            if subdir.is_dir():
-                print(f"搜索子目录: {subdir}")
-                # 搜索所有.bmp文件
-                bmp_files = list(subdir.glob("*.bmp"))
-                for bmp_file in bmp_files:
-                    try:
-                        self.avatar_image = Image.open(bmp_file)
-                        # 调整大小为适当尺寸
-                        self.avatar_image = self.avatar_image.resize((64, 64), Image.Resampling.LANCZOS)
-                        print(f"找到并加载头像: {bmp_file}")
-                        return
-                    except Exception as e:
-                        print(f"加载头像失败 {bmp_file}: {e}")
-        
-        print("未找到任何.bmp头像文件")    
+        self._avatar_candidates = []
+        for subdir in self._subdirs:
+            logger.debug(f"搜索子目录: {subdir}")
+            # 搜索所有.bmp文件（无法读取的子目录跳过）
+            try:
+                with os.scandir(subdir) as it:
+                    self._avatar_candidates.extend(
+                        Path(entry.path) for entry in it
+                        if entry.name.lower().endswith('.bmp') and entry.is_file()
+                    )
+            except OSError as e:
+                logger.debug(f"跳过无法读取的子目录 {subdir}: {e}")
+        
+        if not self._avatar_candidates:
+            logger.debug("未找到任何.bmp头像文件")
+    
+    @property
+    def avatar_image(self) -> Optional[Image.Image]:
+        """头像图片，首次访问时依次尝试解码候选文件"""
+        if self._avatar_image is None and self._avatar_candidates:
+            candidates, self._avatar_candidates = self._avatar_candidates, []
+            for bmp_file in candidates:
+                try:
+                    image = Image.open(bmp_file)
+                    # 允许解码器直接按缩小尺寸解码（JPEG 等格式有效）
+                    image.draft(None, (64, 64))
+                    # 调整大小为适当尺寸；大图先整数倍缩小再做 Lanczos
+                    self._avatar_image = image.resize(
+                        (64, 64), Image.Resampling.LANCZOS, reducing_gap=3.0
+                    )
+                    logger.debug(f"找到并加载头像: {bmp_file}")
+                    break
+                except Exception as e:
+                    logger.warning(f"加载头像失败 {bmp_file}: {e}")
+        return self._avatar_image
+    
+    @avatar_image.setter
+    def avatar_image(self, image: Optional[Image.Image]):
+        self._avatar_image = image
+        self._avatar_candidates = []
+    
     def get_avatar_photo(self):
         """获取Tkinter可用的头像照片"""
         if self.avatar_image and self.avatar_photo is None:
@@ -334,7 +658,7 @@ class VoiceLibrary:
     def get_library_name(self) -> str:
         """获取音源库名称"""
         name = self.character_info.get('name', self.library_path.name)
-        print(f"获取音源库名称: {name}")
+        logger.debug(f"获取音源库名称: {name}")
         return name
     
     def get_author(self) -> str:
@@ -346,99 +670,82 @@ class VoiceLibrary:
         oto_path = self.library_path / "oto.ini"
         if not oto_path.exists():
             # 尝试在子目录中查找
-            for subdir in self.library_path.iterdir():
-                if subdir.is_dir():
-                    oto_path = subdir / "oto.ini"
-                    if oto_path.exists():
-                        break
+            for subdir in self._subdirs:
+                oto_path = subdir / "oto.ini"
+                if oto_path.exists():
+                    break
         
         if oto_path.exists():
-            print(f"找到 oto.ini: {oto_path}")
+            logger.info(f"找到 oto.ini: {oto_path}")
             try:
                 # 尝试多种编码
-                encodings = ['shift_jis', 'utf-8', 'cp932', 'gbk']
-                for encoding in encodings:
-                    try:
-                        with open(oto_path, 'r', encoding=encoding) as f:
-                            current_file = None
-                            for line in f:
-                                line = line.strip()
-                                if line.startswith('[') and line.endswith(']'):
-                                    current_file = line[1:-1]
-                                    self.oto_ini_data[current_file] = {}
-                                elif '=' in line and current_file:
-                                    key, value = line.split('=', 1)
-                                    self.oto_ini_data[current_file][key.strip()] = value.strip()
-                        print(f"成功解析 oto.ini，使用编码: {encoding}")
-                        break
-                    except UnicodeDecodeError:
-                        continue
+                decoded = _read_text(oto_path, ('shift_jis', 'utf-8', 'cp932', 'gbk'))
+                if decoded is not None:
+                    content, encoding = decoded
+                    # 在内存中逐行解析
+                    current_file = None
+                    entry = None
+                    for line in content.split('\n'):
+                        line = line.strip()
+                        if line.startswith('[') and line.endswith(']'):
+                            current_file = line[1:-1]
+                            entry = self.oto_ini_data[current_file] = {}
+                        elif current_file and '=' in line:
+                            key, value = line.split('=', 1)
+                            entry[key.strip()] = value.strip()
+                    logger.info(f"成功解析 oto.ini，使用编码: {encoding}")
             except Exception as e:
-                print(f"解析 oto.ini 失败: {e}")
+                logger.warning(f"解析 oto.ini 失败: {e}")
         else:
-            print("未找到 oto.ini 文件")
+            logger.debug("未找到 oto.ini 文件")
     
-    def add_sample(self, audio_file: Path):
-        """添加音频样本"""
+    def add_sample(self, audio_file, name: Optional[str] = None):
+        """添加音频样本
+        
+        audio_file 可为路径字符串或 Path；name 为文件名（扫描时由 DirEntry 提供），
+        省略时从路径中取出。文件名用字符串操作去掉扩展名，不经过 pathlib 解析
+        """
         try:
             # 从文件名推断音高和歌词
-            filename = audio_file.stem
+            if name is None:
+                name = os.path.basename(audio_file)
+            filename = name.rpartition('.')[0] or name
             pitch = self.extract_pitch_from_filename(filename)
             lyric = self.extract_lyric_from_filename(filename)
             
             sample = VoiceSample(
-                file_path=audio_file,
+                file_path=Path(audio_file),
                 pitch=pitch,
-                lyric=lyric
+                lyric=lyric,
+                arena=self._arena
             )
             
             if lyric not in self.samples:
                 self.samples[lyric] = []
+                self._lyric_index = None
             self.samples[lyric].append(sample)
+            self._pitches.pop(lyric, None)
+            if self._min_pitch is None:
+                self._min_pitch = self._max_pitch = pitch
+            else:
+                self._min_pitch = min(self._min_pitch, pitch)
+                self._max_pitch = max(self._max_pitch, pitch)
+            self._best_cache.clear()
             
         except Exception as e:
-            print(f"添加样本失败 {audio_file}: {e}")
+            logger.warning(f"添加样本失败 {audio_file}: {e}")
     
     def extract_pitch_from_filename(self, filename: str) -> int:
         """从文件名提取音高"""
-        # 更全面的音高模式匹配
-        pitch_patterns = [
-            # 低音区
-            (['C1'], 24), (['C#1', 'Db1'], 25), (['D1'], 26), (['D#1', 'Eb1'], 27), 
-            (['E1'], 28), (['F1'], 29), (['F#1', 'Gb1'], 30), (['G1'], 31), 
-            (['G#1', 'Ab1'], 32), (['A1'], 33), (['A#1', 'Bb1'], 34), (['B1'], 35),
-            # 中低音区
-            (['C2'], 36), (['C#2', 'Db2'], 37), (['D2'], 38), (['D#2', 'Eb2'], 39), 
-            (['E2'], 40), (['F2'], 41), (['F#2', 'Gb2'], 42), (['G2'], 43), 
-            (['G#2', 'Ab2'], 44), (['A2'], 45), (['A#2', 'Bb2'], 46), (['B2'], 47),
-            # 中音区
-            (['C3'], 48), (['C#3', 'Db3'], 49), (['D3'], 50), (['D#3', 'Eb3'], 51), 
-            (['E3'], 52), (['F3'], 53), (['F#3', 'Gb3'], 54), (['G3'], 55), 
-            (['G#3', 'Ab3'], 56), (['A3'], 57), (['A#3', 'Bb3'], 58), (['B3'], 59),
-            # 中央C区
-            (['C4'], 60), (['C#4', 'Db4'], 61), (['D4'], 62), (['D#4', 'Eb4'], 63), 
-            (['E4'], 64), (['F4'], 65), (['F#4', 'Gb4'], 66), (['G4'], 67), 
-            (['G#4', 'Ab4'], 68), (['A4'], 69), (['A#4', 'Bb4'], 70), (['B4'], 71),
-            # 高音区
-            (['C5'], 72), (['C#5', 'Db5'], 73), (['D5'], 74), (['D#5', 'Eb5'], 75), 
-            (['E5'], 76), (['F5'], 77), (['F#5', 'Gb5'], 78), (['G5'], 79), 
-            (['G#5', 'Ab5'], 80), (['A5'], 81), (['A#5', 'Bb5'], 82), (['B5'], 83),
-            # 超高音区
-            (['C6'], 84), (['C#6', 'Db6'], 85), (['D6'], 86), (['D#6', 'Eb6'], 87), 
-            (['E6'], 88), (['F6'], 89), (['F#6', 'Gb6'], 90), (['G6'], 91), 
-            (['G#6', 'Ab6'], 92), (['A6'], 93), (['A#6', 'Bb6'], 94), (['B6'], 95),
-        ]
-        
-        filename_upper = filename.upper()
-        for note_names, midi_pitch in pitch_patterns:
-            for note_name in note_names:
-                if note_name in filename_upper:
-                    return midi_pitch
+        # 一次正则扫描找出文件名中出现的全部音名，取其中最低的音高
+        note_names = _NOTE_NAME_RE.findall(filename.upper())
+        if note_names:
+            return min(_NOTE_TO_MIDI[name] for name in note_names)
         
         # 如果没有找到明确的音高标记，尝试从文件名中提取数字
-        numbers = re.findall(r'\d+', filename)
-        if numbers:
-            number = int(numbers[0])
+        number_match = _DIGITS_RE.search(filename)
+        if number_match:
+            number = int(number_match.group())
             # 扩展合理的MIDI音高范围
             if 24 <= number <= 95:
                 return number
@@ -448,95 +755,94 @@ class VoiceLibrary:
     
     def extract_lyric_from_filename(self, filename: str) -> str:
         """从文件名提取歌词"""
-        # 移除常见的音高标记和数字
-        import re
-        
         # 首先尝试从oto.ini中获取歌词映射
         if filename in self.oto_ini_data:
             oto_entry = self.oto_ini_data[filename]
             if 'alias' in oto_entry:
                 return oto_entry['alias']
         
-        # 移除音高标记
-        pitch_pattern = r'[A-G][#b]?\d+'
-        cleaned = re.sub(pitch_pattern, '', filename, flags=re.IGNORECASE)
-        
-        # 移除数字
-        cleaned = re.sub(r'\d+', '', cleaned)
-        
-        # 移除常见分隔符和扩展名相关
-        cleaned = re.sub(r'[._-]', '', cleaned)
-        
-        # 如果是日语音源，尝试提取平假名或片假名
-        japanese_pattern = r'[ぁ-んァ-ンー]'
-        japanese_chars = re.findall(japanese_pattern, cleaned)
-        if japanese_chars:
-            return japanese_chars[0]
-        
-        # 如果是中文音源，尝试提取中文字符
-        chinese_pattern = r'[\u4e00-\u9fff]'
-        chinese_chars = re.findall(chinese_pattern, cleaned)
-        if chinese_chars:
-            return chinese_chars[0]
-        
-        # 如果是韩语音源
-        korean_pattern = r'[가-힣]'
-        korean_chars = re.findall(korean_pattern, cleaned)
-        if korean_chars:
-            return korean_chars[0]
-        
-        # 如果是英文或其他，返回前2个字母（如果是辅音+元音组合）
-        if len(cleaned) >= 2:
-            # 检查是否是常见的音节组合
-            common_syllables = ['la', 'le', 'li', 'lo', 'lu', 'ra', 're', 'ri', 'ro', 'ru',
-                              'ma', 'me', 'mi', 'mo', 'mu', 'na', 'ne', 'ni', 'no', 'nu',
-                              'pa', 'pe', 'pi', 'po', 'pu', 'ba', 'be', 'bi', 'bo', 'bu']
-            first_two = cleaned[:2].lower()
-            if first_two in common_syllables:
-                return first_two
-        
-        # 返回第一个非空字符
-        if cleaned:
-            return cleaned[0]
-        
-        # 最后手段：使用文件名前2个字符
-        return filename[:2] if len(filename) >= 2 else filename
+        return _lyric_from_stem(filename)
+    
+    def _index_samples(self):
+        """把每个歌词的样本按音高排序（稳定排序，同音高保持加入顺序）并建立音高列表"""
+        for lyric in self.samples:
+            self._index_lyric(lyric)
+    
+    def _index_lyric(self, lyric: str) -> List[int]:
+        """排序单个歌词的样本并返回其音高列表"""
+        samples = self.samples[lyric]
+        samples.sort(key=lambda s: s.pitch)
+        pitches = self._pitches[lyric] = [s.pitch for s in samples]
+        return pitches
     
     def get_best_sample(self, lyric: str, target_pitch: int) -> Optional[VoiceSample]:
-        """获取最适合指定歌词和音高的样本"""
+        """获取最适合指定歌词和音高的样本（结果按 (歌词, 音高) 缓存）"""
+        key = (lyric, target_pitch)
+        try:
+            return self._best_cache[key]
+        except KeyError:
+            pass
+        sample = self._find_best_sample(lyric, target_pitch)
+        self._best_cache[key] = sample
+        return sample
+    
+    def _find_best_sample(self, lyric: str, target_pitch: int) -> Optional[VoiceSample]:
+        """二分查找音高最接近的样本；距离相同时取较低音高，同音高取先加入的"""
         if lyric not in self.samples or not self.samples[lyric]:
             # 尝试找到相似的歌词
             similar_lyrics = self.find_similar_lyrics(lyric)
             if not similar_lyrics:
-                print(f"没有找到歌词 '{lyric}' 的样本")
+                logger.warning(f"没有找到歌词 '{lyric}' 的样本")
                 return None
             # 使用第一个相似的歌词
             lyric = similar_lyrics[0]
         
-        available_samples = self.samples[lyric]
-        
-        # 优先选择音高接近的样本（±3个半音内）
-        close_samples = [s for s in available_samples if abs(s.pitch - target_pitch) <= 3]
-        if close_samples:
-            # 在接近样本中按音高接近程度排序
-            close_samples.sort(key=lambda x: abs(x.pitch - target_pitch))
-            return close_samples[0]
-        else:
-            # 如果没有接近样本，使用所有样本中最接近的
-            available_samples.sort(key=lambda x: abs(x.pitch - target_pitch))
-            return available_samples[0]
+        samples = self.samples[lyric]
+        pitches = self._pitches.get(lyric)
+        if pitches is None:
+            pitches = self._index_lyric(lyric)
+        
+        # 只需比较目标音高两侧的样本
+        i = bisect.bisect_left(pitches, target_pitch)
+        if i == len(pitches):
+            i = bisect.bisect_left(pitches, pitches[-1])
+        elif i > 0 and target_pitch - pitches[i - 1] <= pitches[i] - target_pitch:
+            i = bisect.bisect_left(pitches, pitches[i - 1])
+        return samples[i]
+    
+    def _get_lyric_index(self):
+        """返回 (歌词 -> 顺序, 子串 -> 包含它的歌词, 发音分组 -> 歌词)，按需建立"""
+        if self._lyric_index is None:
+            order = {}
+            by_substring: Dict[str, List[str]] = {}
+            by_group: Dict[str, List[str]] = {}
+            for position, lyric in enumerate(self.samples):
+                order[lyric] = position
+                for sub in _substrings(lyric):
+                    by_substring.setdefault(sub, []).append(lyric)
+                group = _PRONUNCIATION_GROUP.get(lyric.lower())
+                if group is not None:
+                    by_group.setdefault(group, []).append(lyric)
+            self._lyric_index = (order, by_substring, by_group)
+        return self._lyric_index
     
     def find_similar_lyrics(self, target_lyric: str) -> List[str]:
-        """查找相似的歌词"""
-        similar = []
-        for lyric in self.samples.keys():
-            if target_lyric == lyric:
-                similar.insert(0, lyric)  # 完全匹配的优先级最高
-            elif target_lyric in lyric or lyric in target_lyric:
-                similar.append(lyric)
-            elif self.is_similar_pronunciation(target_lyric, lyric):
-                similar.append(lyric)
-        
+        """查找相似的歌词：互为子串或发音相似，按歌词加入顺序返回"""
+        order, by_substring, by_group = self._get_lyric_index()
+        
+        # 包含目标的歌词（含完全匹配）
+        matches = set(by_substring.get(target_lyric, ()))
+        # 被目标包含的歌词
+        matches.update(sub for sub in _substrings(target_lyric) if sub in order)
+        # 发音相似的歌词
+        group = _PRONUNCIATION_GROUP.get(target_lyric.lower()) if target_lyric else None
+        if group is not None:
+            matches.update(by_group.get(group, ()))
+        
+        similar = sorted(matches, key=order.__getitem__)
+        if target_lyric in order:
+            similar.remove(target_lyric)
+            similar.insert(0, target_lyric)  # 完全匹配的优先级最高
         return similar
     
     def is_similar_pronunciation(self, lyric1: str, lyric2: str) -> bool:
@@ -544,33 +850,49 @@ class VoiceLibrary:
         if len(lyric1) == 0 or len(lyric2) == 0:
             return False
         
-        # 发音相似性映射（简化的实现）
-        pronunciation_groups = {
-            'a': ['a', 'ah', 'aa'],
-            'i': ['i', 'ee', 'ii'],
-            'u': ['u', 'oo', 'uu'],
-            'e': ['e', 'eh'],
-            'o': ['o', 'oh'],
-            'ka': ['ka', 'ca'],
-            'ki': ['ki', 'key'],
-            'ku': ['ku', 'coo'],
-            'ke': ['ke', 'kay'],
-            'ko': ['ko', 'co'],
-        }
-        
-        lyric1_lower = lyric1.lower()
-        lyric2_lower = lyric2.lower()
-        
-        for group in pronunciation_groups.values():
-            if lyric1_lower in group and lyric2_lower in group:
-                return True
-        
-        return False
+        group = _PRONUNCIATION_GROUP.get(lyric1.lower())
+        return group is not None and group == _PRONUNCIATION_GROUP.get(lyric2.lower())
     
     def is_japanese(self, text: str) -> bool:
         """判断文本是否为日文"""
-        import re
-        return bool(re.search(r'[ぁ-んァ-ン]', text))
+        return _KANA_RE.search(text) is not None
+    
+    def get_pitch_shifted(self, sample: VoiceSample, target_pitch: int) -> np.ndarray:
+        """获取移调后的样本，重复的 (样本, 半音数) 组合直接命中缓存
+        
+        返回的数组为只读视图，需要修改时请自行复制
+        """
+        key = (sample.file_path, target_pitch - sample.pitch)
+        audio_data = self._shift_cache.get(key)
+        if audio_data is not None:
+            self._shift_cache.move_to_end(key)
+            return audio_data.view()
+        
+        audio_data = sample.get_pitch_shifted(target_pitch)
+        audio_data.flags.writeable = False
+        self._shift_cache[key] = audio_data
+        self._shift_cache_bytes += audio_data.nbytes
+        
+        owner = self._stft_owners.setdefault(sample.file_path, [sample, 0, 0])
+        owner[1] += 1
+        stft_bytes = sample._stft.nbytes if sample._stft is not None else 0
+        self._shift_cache_bytes += stft_bytes - owner[2]
+        owner[2] = stft_bytes
+        
+        while self._shift_cache and (
+            len(self._shift_cache) > _SHIFT_CACHE_MAX_ENTRIES
+            or self._shift_cache_bytes > _SHIFT_CACHE_MAX_BYTES
+        ):
+            (file_path, _), evicted = self._shift_cache.popitem(last=False)
+            self._shift_cache_bytes -= evicted.nbytes
+            owner = self._stft_owners[file_path]
+            owner[1] -= 1
+            if owner[1] == 0:
+                # 该样本已没有缓存的移调结果，释放其分析 STFT
+                owner[0]._stft = None
+                self._shift_cache_bytes -= owner[2]
+                del self._stft_owners[file_path]
+        return audio_data.view()
     
     def get_available_lyrics(self) -> List[str]:
         """获取所有可用的歌词"""
@@ -582,36 +904,52 @@ class VoiceLibrary:
     
     def get_pitch_range(self) -> Tuple[int, int]:
         """获取音源库的音高范围"""
-        all_pitches = []
-        for samples in self.samples.values():
-            for sample in samples:
-                all_pitches.append(sample.pitch)
-        
-        if all_pitches:
-            return min(all_pitches), max(all_pitches)
+        if self._min_pitch is not None:
+            return self._min_pitch, self._max_pitch
         else:
             return 60, 60  # 默认范围
-    def batch_preload_samples(self, max_workers=4):
-        """批量预加载样本（多线程）"""
-        try:
-            from concurrent.futures import ThreadPoolExecutor
-            
-            all_samples = []
-            for samples in self.samples.values():
-                all_samples.extend(samples)
-            
-            def load_sample(sample):
-                sample.load_sample()
-                return sample
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                list(executor.map(load_sample, all_samples))
-                
-            print(f"已预加载 {len(all_samples)} 个样本")
-            
-        except ImportError:
-            # 如果没有concurrent.futures，顺序加载
-            for samples in self.samples.values():
-                for sample in samples:
-                    sample.load_sample()
+    
+    def batch_preload_samples(self, max_workers=None):
+        """批量预加载样本（多进程解码，不可用时退回多线程）"""
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        from .utils import process_pool_context
+        
+        all_samples = [
+            sample for samples in self.samples.values()
+            for sample in samples if sample.sample_data is None
+        ]
+        if max_workers is None:
+            max_workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+        
+        if sf is not None and max_workers > 1 and len(all_samples) > 1:
+            try:
+                # 解码在工作进程中完成，只回传音频数组
+                with ProcessPoolExecutor(max_workers=max_workers,
+                                         mp_context=process_pool_context()) as executor:
+                    results = list(executor.map(
+                        _load_one,
+                        [sample.file_path for sample in all_samples],
+                        [sample.sample_rate for sample in all_samples],
+                        chunksize=8
+                    ))
+                self._arena.reserve(sum(len(result[0]) for result in results if result is not None))
+                for sample, result in zip(all_samples, results):
+                    if result is not None:
+                        data, sample.sample_rate, _ = result
+                        sample.set_sample_data(data)
+                    else:
+                        sample.load_sample()
+                logger.info(f"已预加载 {len(all_samples)} 个样本")
+                return
+            except Exception as e:
+                logger.warning(f"多进程预加载失败，改用多线程: {e}")
+        
+        def load_sample(sample):
+            sample.load_sample()
+            return sample
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(load_sample, all_samples))
+        
+        logger.info(f"已预加载 {len(all_samples)} 个样本")
 